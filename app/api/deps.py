@@ -1,3 +1,4 @@
+import logging
 from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -7,9 +8,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, models, schemas
 from app.core import security
+from app.core.cache import principal_cache
 from app.core.config import settings
+from app.core.revocation import revocation_list
+from app.core.tokens import get_token_version
 from app.db.session import AsyncSessionLocal
 
+logger = logging.getLogger(__name__)
+
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
@@ -24,11 +30,13 @@ async def get_db() -> AsyncSession:
         finally:
             await session.close()
 
-async def get_current_user(
-    db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+async def get_token_payload(
+    token: str = Depends(reusable_oauth2),
+) -> schemas.TokenPayload:
     """
-    获取当前用户
+    解析并校验访问令牌
+
+    令牌版本号落后于用户当前版本（被禁用、修改权限或密码）或已被吊销时视为失效
     """
     try:
         payload = jwt.decode(
@@ -40,9 +48,50 @@ async def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
+    if token_data.type != "access" or token_data.sub is None:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Could not validate credentials",
+        )
+    try:
+        version = await get_token_version(token_data.sub)
+        revoked = bool(token_data.jti) and await revocation_list.is_revoked(token_data.jti)
+    except Exception as e:
+        # 无法确认令牌是否失效时拒绝请求（fail closed）
+        logger.error(f"Token validation backend error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service unavailable",
+        )
+    if token_data.ver != version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked, please login again",
+        )
+    if revoked:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked, please login again",
+        )
+    return token_data
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(reusable_oauth2),
+    token_data: schemas.TokenPayload = Depends(get_token_payload),
+) -> models.User:
+    """
+    获取当前用户
+
+    优先读取用户缓存，未命中时查询数据库并回填
+    """
+    user = await principal_cache.get(token_data.sub, token)
+    if user:
+        return user
     user = await crud.user.get(db, id=token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    await principal_cache.set(user, token)
     return user
 
 async def get_current_active_user(
@@ -51,30 +100,44 @@ async def get_current_active_user(
     """
     获取当前活跃用户
     """
-    if not crud.user.is_active(current_user):
+    if not await crud.user.is_active(current_user):
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+def get_token_principal(token_data: schemas.TokenPayload) -> models.User:
+    """
+    由令牌声明构造用户对象（仅包含 id、角色和状态）
+    """
+    return principal_cache.to_user(
+        {"id": token_data.sub, "role": token_data.role, "status": token_data.status}
+    )
+
 async def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
+    token_data: schemas.TokenPayload = Depends(get_token_payload),
 ) -> models.User:
     """
-    获取当前超级用户
+    获取当前超级用户（仅依据令牌声明，不查询数据库）
     """
-    if not crud.user.is_superuser(current_user):
+    current_user = get_token_principal(token_data)
+    if not current_user.status:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if not await crud.user.is_superuser(current_user):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
 
 async def get_current_active_admin(
-    current_user: models.User = Depends(get_current_user),
+    token_data: schemas.TokenPayload = Depends(get_token_payload),
 ) -> models.User:
     """
-    获取当前管理员用户
+    获取当前管理员用户（仅依据令牌声明，不查询数据库）
     """
-    if not crud.user.is_admin(current_user):
+    current_user = get_token_principal(token_data)
+    if not current_user.status:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    if not await crud.user.is_admin(current_user):
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return current_user 
\ No newline at end of file
+    return current_user
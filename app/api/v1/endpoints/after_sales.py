@@ -1,16 +1,19 @@
 from typing import Any, List
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
 from app.api import deps
-from app.services import after_sale as after_sale_service
+from app.core.idempotency import Idempotency, IdempotentRequest
+from app.services.after_sale import after_sale_service
 
 router = APIRouter()
 
+after_sale_idempotency = Idempotency("after_sales")
+
 @router.get("/", response_model=schemas.AfterSaleList)
-def read_after_sales(
-    db: Session = Depends(deps.get_db),
+async def read_after_sales(
+    db: AsyncSession = Depends(deps.get_db),
     skip: int = 0,
     limit: int = 100,
     user_id: int = None,
@@ -22,47 +25,54 @@ def read_after_sales(
     """
     获取售后申请列表
     """
-    after_sales = after_sale_service.get_after_sales(
-        db, skip=skip, limit=limit, user_id=user_id, order_id=order_id, status=status, type=type
-    )
-    total = db.query(models.AfterSale).count()
+    filters = dict(user_id=user_id, order_id=order_id, status=status, type=type)
+    after_sales = await after_sale_service.get_after_sales(db, skip=skip, limit=limit, **filters)
+    total = await after_sale_service.count_after_sales(db, **filters)
     return {"total": total, "items": after_sales}
 
 @router.post("/", response_model=schemas.AfterSale)
-def create_after_sale(
+async def create_after_sale(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     after_sale_in: schemas.AfterSaleCreate,
+    idempotency: IdempotentRequest = Depends(after_sale_idempotency),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    创建售后申请
+    创建售后申请，携带 Idempotency-Key 的重试返回第一次创建的申请
     """
     try:
-        after_sale = after_sale_service.create_after_sale(db, after_sale_in, current_user.id)
-        return after_sale
+        return await idempotency.run(
+            db,
+            current_user.id,
+            lambda: after_sale_service.create_after_sale(
+                db, after_sale_in, current_user.id, idempotency
+            ),
+            lambda after_sale_id: after_sale_service.get_after_sale(db, after_sale_id),
+            schemas.AfterSale,
+        )
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{after_sale_id}", response_model=schemas.AfterSale)
-def read_after_sale(
+async def read_after_sale(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     after_sale_id: int,
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     获取售后申请详情
     """
-    after_sale = after_sale_service.get_after_sale(db, after_sale_id)
+    after_sale = await after_sale_service.get_after_sale(db, after_sale_id)
     if not after_sale:
         raise HTTPException(status_code=404, detail="售后申请不存在")
     return after_sale
 
 @router.put("/{after_sale_id}", response_model=schemas.AfterSale)
-def update_after_sale(
+async def update_after_sale(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     after_sale_id: int,
     after_sale_in: schemas.AfterSaleUpdate,
     current_user: models.User = Depends(deps.get_current_active_admin),
@@ -70,7 +80,7 @@ def update_after_sale(
     """
     更新售后申请
     """
-    after_sale = after_sale_service.update_after_sale(
+    after_sale = await after_sale_service.update_after_sale(
         db, after_sale_id, after_sale_in, operator=f"admin_{current_user.id}"
     )
     if not after_sale:
@@ -78,9 +88,9 @@ def update_after_sale(
     return after_sale
 
 @router.get("/{after_sale_id}/logs", response_model=schemas.AfterSaleLogList)
-def read_after_sale_logs(
+async def read_after_sale_logs(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     after_sale_id: int,
     skip: int = 0,
     limit: int = 100,
@@ -89,14 +99,14 @@ def read_after_sale_logs(
     """
     获取售后申请日志
     """
-    logs = after_sale_service.get_after_sale_logs(db, after_sale_id, skip, limit)
-    total = db.query(models.AfterSaleLog).filter(models.AfterSaleLog.after_sale_id == after_sale_id).count()
+    logs = await after_sale_service.get_after_sale_logs(db, after_sale_id, skip, limit)
+    total = await after_sale_service.count_after_sale_logs(db, after_sale_id)
     return {"total": total, "items": logs}
 
 @router.post("/{after_sale_id}/logs", response_model=schemas.AfterSaleLog)
-def create_after_sale_log(
+async def create_after_sale_log(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     after_sale_id: int,
     log_in: schemas.AfterSaleLogCreate,
     current_user: models.User = Depends(deps.get_current_active_admin),
@@ -104,8 +114,8 @@ def create_after_sale_log(
     """
     创建售后申请日志
     """
-    after_sale = after_sale_service.get_after_sale(db, after_sale_id)
+    after_sale = await after_sale_service.get_after_sale(db, after_sale_id)
     if not after_sale:
         raise HTTPException(status_code=404, detail="售后申请不存在")
-    log = after_sale_service.create_after_sale_log(db, after_sale_id, log_in)
+    log = await after_sale_service.create_after_sale_log(db, after_sale_id, log_in)
     return log 
\ No newline at end of file
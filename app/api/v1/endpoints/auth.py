@@ -1,5 +1,4 @@
-from datetime import timedelta
-from typing import Any
+from typing import Any, Optional
 from fastapi import APIRouter, Body, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -8,9 +7,15 @@ import logging
 
 from app import crud, models, schemas
 from app.api import deps
-from app.core import security
 from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.rate_limit import RateLimiter
+from app.core.revocation import revocation_list
+from app.core.tokens import (
+    consume_refresh_token,
+    get_token_version,
+    issue_tokens,
+    revoke_refresh_token,
+)
 from app.utils import (
     generate_password_reset_token,
     verify_password_reset_token,
@@ -22,11 +27,28 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 登录与找回密码限流，在任何密码计算或发信之前拒绝
+login_rate_limiter = RateLimiter(
+    "login",
+    limit=settings.LOGIN_RATE_LIMIT,
+    window_seconds=settings.LOGIN_RATE_LIMIT_WINDOW_SECONDS,
+)
+password_recovery_rate_limiter = RateLimiter(
+    "password_recovery",
+    limit=settings.PASSWORD_RECOVERY_RATE_LIMIT,
+    window_seconds=settings.PASSWORD_RECOVERY_RATE_LIMIT_WINDOW_SECONDS,
+    key_func=lambda request: request.path_params.get("email"),
+)
+
 class LoginRequest(BaseModel):
     username: str
     password: str
 
-@router.post("/login/access-token", response_model=schemas.Token)
+@router.post(
+    "/login/access-token",
+    response_model=schemas.Token,
+    dependencies=[Depends(login_rate_limiter)],
+)
 async def login_access_token(
     db: Session = Depends(deps.get_db),
     login_data: LoginRequest = Body(...)
@@ -35,6 +57,7 @@ async def login_access_token(
     OAuth2 compatible token login, get an access token for future requests
     """
     logger.info(f"开始处理登录请求 - 用户名: {login_data.username}")
+    await login_rate_limiter.check("username", login_data.username.lower())
     
     try:
         # 验证用户
@@ -50,23 +73,51 @@ async def login_access_token(
             logger.warning(f"登录失败 - 用户已被禁用: {login_data.username}")
             raise HTTPException(status_code=400, detail="用户已被禁用")
             
-        # 生成访问令牌
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = security.create_access_token(
-            user.id, expires_delta=access_token_expires
-        )
+        # 生成访问令牌和刷新令牌
+        tokens = await issue_tokens(user)
         
         logger.info(f"登录成功 - 用户: {login_data.username}, 角色: {user.role}")
         
-        return {
-            "access_token": access_token,
-            "token_type": "bearer",
-        }
+        return tokens
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"登录过程发生错误 - 用户名: {login_data.username}, 错误: {str(e)}")
         raise HTTPException(status_code=500, detail="登录过程发生错误")
 
+@router.post("/refresh-token", response_model=schemas.Token)
+async def refresh_access_token(
+    db: Session = Depends(deps.get_db),
+    refresh_in: schemas.RefreshTokenRequest = Body(...),
+) -> Any:
+    """
+    使用刷新令牌换取新的访问令牌（刷新令牌一次性使用）
+    """
+    data = await consume_refresh_token(refresh_in.refresh_token)
+    if not data:
+        raise HTTPException(status_code=401, detail="无效的刷新令牌")
+    user = await crud.user.get(db, id=data["user_id"])
+    if not user or not user.status:
+        raise HTTPException(status_code=401, detail="用户不存在或已被禁用")
+    if data["ver"] != await get_token_version(user.id):
+        raise HTTPException(status_code=401, detail="刷新令牌已失效，请重新登录")
+    return await issue_tokens(user)
+
+@router.post("/logout", response_model=schemas.Msg)
+async def logout(
+    token_data: schemas.TokenPayload = Depends(deps.get_token_payload),
+    refresh_in: Optional[schemas.RefreshTokenRequest] = Body(None),
+) -> Any:
+    """
+    退出登录，吊销当前访问令牌及（可选的）刷新令牌
+    """
+    if token_data.jti:
+        await revocation_list.revoke(token_data.jti, token_data.exp)
+    if refresh_in:
+        await revoke_refresh_token(refresh_in.refresh_token)
+    return {"msg": "已退出登录"}
+
 @router.post("/login/test-token", response_model=schemas.User)
 def test_token(current_user: models.User = Depends(deps.get_current_user)) -> Any:
     """
@@ -74,12 +125,16 @@ def test_token(current_user: models.User = Depends(deps.get_current_user)) -> An
     """
     return current_user
 
-@router.post("/password-recovery/{email}", response_model=schemas.Msg)
-def recover_password(email: str, db: Session = Depends(deps.get_db)) -> Any:
+@router.post(
+    "/password-recovery/{email}",
+    response_model=schemas.Msg,
+    dependencies=[Depends(password_recovery_rate_limiter)],
+)
+async def recover_password(email: str, db: Session = Depends(deps.get_db)) -> Any:
     """
     Password Recovery
     """
-    user = crud.user.get_by_email(db, email=email)
+    user = await crud.user.get_by_email(db, email=email)
 
     if not user:
         raise HTTPException(
@@ -93,7 +148,7 @@ def recover_password(email: str, db: Session = Depends(deps.get_db)) -> Any:
     return {"msg": "密码重置邮件已发送"}
 
 @router.post("/reset-password/", response_model=schemas.Msg)
-def reset_password(
+async def reset_password(
     token: str = Body(...),
     new_password: str = Body(...),
     db: Session = Depends(deps.get_db),
@@ -104,7 +159,7 @@ def reset_password(
     email = verify_password_reset_token(token)
     if not email:
         raise HTTPException(status_code=400, detail="无效的token")
-    user = crud.user.get_by_email(db, email=email)
+    user = await crud.user.get_by_email(db, email=email)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -112,8 +167,6 @@ def reset_password(
         )
     elif not user.status:
         raise HTTPException(status_code=400, detail="用户已被禁用")
-    hashed_password = get_password_hash(new_password)
-    user.hashed_password = hashed_password
-    db.add(user)
-    db.commit()
-    return {"msg": "密码重置成功"} 
\ No newline at end of file
+    # 通过 crud 更新以便同时失效用户缓存
+    await crud.user.update(db, db_obj=user, obj_in={"password": new_password})
+    return {"msg": "密码重置成功"}
\ No newline at end of file
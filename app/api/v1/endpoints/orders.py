@@ -1,12 +1,15 @@
 from typing import List, Any
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from app import models, schemas
+from app import crud, models, schemas
 from app.api import deps
-from app.services.order import order_service
+from app.core.idempotency import Idempotency, IdempotentRequest
+from app.services.order import OWNER_UPDATE_FIELDS, order_service
 
 router = APIRouter()
 
+order_idempotency = Idempotency("orders")
+
 
 @router.get("/", response_model=List[schemas.OrderInDB])
 async def read_orders(
@@ -18,7 +21,7 @@ async def read_orders(
     """
     获取订单列表
     """
-    if not crud.user.is_superuser(current_user):
+    if not await crud.user.is_superuser(current_user):
         orders = await order_service.get_orders(
             db=db, user_id=current_user.id, skip=skip, limit=limit
         )
@@ -31,16 +34,25 @@ async def read_orders(
 async def create_order(
     *,
     db: AsyncSession = Depends(deps.get_db),
-    order_in: schemas.OrderCreate,
+    order_in: schemas.OrderRequest,
+    idempotency: IdempotentRequest = Depends(order_idempotency),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    创建新订单
+    创建新订单，携带 Idempotency-Key 的重试返回第一次创建的订单
     """
-    order = await order_service.create_order(
-        db=db, obj_in=order_in, user_id=current_user.id
-    )
-    return order
+    try:
+        return await idempotency.run(
+            db,
+            current_user.id,
+            lambda: order_service.create_order(
+                db=db, obj_in=order_in, user_id=current_user.id, idempotency=idempotency
+            ),
+            lambda order_id: order_service.get_order(db=db, order_id=order_id),
+            schemas.OrderInDB,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{order_id}", response_model=schemas.OrderInDB)
@@ -56,7 +68,7 @@ async def read_order(
     order = await order_service.get_order(db=db, order_id=order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    if not crud.user.is_superuser(current_user) and order.user_id != current_user.id:
+    if not await crud.user.is_superuser(current_user) and order.user_id != current_user.id:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     return order
 
@@ -70,16 +82,27 @@ async def update_order(
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    更新订单
+    更新订单，普通用户只能取消自己的待支付订单
     """
     order = await order_service.get_order(db=db, order_id=order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    if not crud.user.is_superuser(current_user) and order.user_id != current_user.id:
-        raise HTTPException(status_code=400, detail="Not enough permissions")
-    order = await order_service.update_order(
-        db=db, order_id=order_id, obj_in=order_in
-    )
+    if not await crud.user.is_superuser(current_user):
+        if order.user_id != current_user.id:
+            raise HTTPException(status_code=400, detail="Not enough permissions")
+        update_data = order_in.dict(exclude_unset=True)
+        if (
+            order.status != "pending"
+            or update_data.get("status") != "cancelled"
+            or not set(update_data) <= OWNER_UPDATE_FIELDS
+        ):
+            raise HTTPException(status_code=400, detail="只能取消待支付的订单")
+    try:
+        order = await order_service.update_order(
+            db=db, order_id=order_id, order_in=order_in
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return order
 
 
@@ -96,7 +119,7 @@ async def read_order_logs(
     order = await order_service.get_order(db=db, order_id=order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
-    if not crud.user.is_superuser(current_user) and order.user_id != current_user.id:
+    if not await crud.user.is_superuser(current_user) and order.user_id != current_user.id:
         raise HTTPException(status_code=400, detail="Not enough permissions")
     logs = await order_service.get_order_logs(db=db, order_id=order_id)
     return logs 
\ No newline at end of file
@@ -263,9 +263,12 @@ async def update_product_sku(
     """
     更新商品SKU
     """
-    sku = await product_sku_service.update_sku(
-        db=db, sku_id=sku_id, obj_in=sku_in
-    )
+    try:
+        sku = await product_sku_service.update_sku(
+            db=db, sku_id=sku_id, obj_in=sku_in
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     if not sku:
         raise HTTPException(status_code=404, detail="SKU not found")
     return sku
@@ -283,4 +286,37 @@ async def delete_product_sku(
     sku = await product_sku_service.delete_sku(db=db, sku_id=sku_id)
     if not sku:
         raise HTTPException(status_code=404, detail="SKU not found")
-    return sku 
\ No newline at end of file
+    return sku
+
+@router.put("/skus/{sku_id}/hot", response_model=schemas.HotSKU)
+async def set_product_sku_hot(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    sku_id: int,
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    将商品SKU设为热点，下单时在 Redis 中预占库存
+    """
+    stock = await product_sku_service.set_hot(db=db, sku_id=sku_id)
+    if stock is None:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    return {"sku_id": sku_id, "stock": stock}
+
+@router.delete("/skus/{sku_id}/hot", response_model=schemas.Msg)
+async def unset_product_sku_hot(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    sku_id: int,
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    取消商品SKU热点
+    """
+    try:
+        sku = await product_sku_service.unset_hot(db=db, sku_id=sku_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if sku is None:
+        raise HTTPException(status_code=404, detail="SKU not found")
+    return {"msg": "已取消热点"}
@@ -1,65 +1,258 @@
+import asyncio
+import json
 from typing import Any, List
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app import models, schemas
+from app import crud, models, schemas
 from app.api import deps
-from app.services import statistics as statistics_service
+from app.core.config import settings
+from app.core.events import dashboard_events
+from app.tasks.reports import generate_cohort_report
+from app.services.reports import report_service
+from app.services.statistics import (
+    DEFAULT_MAX_POINTS,
+    REFUND_DIMENSIONS,
+    choose_resolution,
+    statistics_service,
+)
 
 router = APIRouter()
 
 @router.get("/dashboard", response_model=schemas.DashboardStats)
-def read_dashboard_stats(
-    db: Session = Depends(deps.get_db),
+async def read_dashboard_stats(
     current_user: models.User = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     获取仪表盘统计数据
     """
-    return statistics_service.get_dashboard_stats(db)
+    return await statistics_service.get_dashboard_stats()
 
-@router.get("/sales-trends", response_model=schemas.SalesTrendList)
-def read_sales_trends(
-    db: Session = Depends(deps.get_db),
+@router.get("/history", response_model=schemas.StatisticsList)
+async def read_statistics_history(
+    db: AsyncSession = Depends(deps.get_db),
     start_date: datetime = Query(default=None),
     end_date: datetime = Query(default=None),
-    skip: int = 0,
-    limit: int = 100,
     current_user: models.User = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
-    获取销售趋势数据
+    获取每日 KPI 快照
     """
+    if not end_date:
+        end_date = datetime.now()
     if not start_date:
-        start_date = datetime.now() - timedelta(days=30)
+        start_date = end_date - timedelta(days=30)
+
+    items = await crud.statistics.get_date_range(db, start_date=start_date, end_date=end_date)
+    return {"total": len(items), "items": items}
+
+@router.get("/stream")
+async def stream_dashboard_events(
+    request: Request,
+    current_user: models.User = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    通过 Server-Sent Events 推送新订单和订单状态变更（含仪表盘增量）
+    """
+    async def event_stream():
+        async with dashboard_events.subscribe() as queue:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(
+                        queue.get(), timeout=settings.SSE_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # 心跳，保持连接并及时发现断开的客户端
+                    yield ": ping\n\n"
+                    continue
+                event = json.loads(message)
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/sales-trends", response_model=schemas.SalesTrendSeries)
+async def read_sales_trends(
+    db: AsyncSession = Depends(deps.get_db),
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    bucket: str = Query(default=None, pattern="^(hour|day|week|month)$"),
+    max_points: int = Query(default=DEFAULT_MAX_POINTS, gt=2, le=5000),
+    current_user: models.User = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    获取销售趋势数据
+
+    按 bucket 分桶（未指定时自动选择），空时间段补零，点数超过 max_points 时降采样
+    """
     if not end_date:
         end_date = datetime.now()
-    
-    trends = statistics_service.get_sales_trends(
-        db, start_date=start_date, end_date=end_date, skip=skip, limit=limit
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
+
+    return await statistics_service.get_sales_series(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        bucket=bucket,
+        max_points=max_points,
     )
-    total = db.query(models.SalesTrend).filter(
-        models.SalesTrend.date.between(start_date, end_date)
-    ).count()
-    return {"total": total, "items": trends}
 
 @router.post("/sales-trends", response_model=schemas.SalesTrend)
-def create_sales_trend(
+async def create_sales_trend(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     trend_in: schemas.SalesTrendCreate,
     current_user: models.User = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     创建销售趋势数据
     """
-    trend = statistics_service.create_sales_trend(db, trend_in)
+    trend = await statistics_service.create_sales_trend(db, obj_in=trend_in)
     return trend
 
+@router.get("/sales-rollups", response_model=schemas.SalesRollupList)
+async def read_sales_rollups(
+    db: AsyncSession = Depends(deps.get_db),
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    bucket: str = Query(default=None, pattern="^(hour|day|week|month)$"),
+    max_points: int = Query(default=DEFAULT_MAX_POINTS, gt=0, le=5000),
+    current_user: models.User = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    获取销售汇总数据，自动选择合适的汇总粒度
+    """
+    if not end_date:
+        end_date = datetime.now()
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
+
+    resolution = choose_resolution(start_date, end_date, bucket, max_points)
+    items = await statistics_service.get_sales_rollups(
+        db, resolution=resolution, start_date=start_date, end_date=end_date
+    )
+    return {"resolution": resolution, "items": items}
+
+@router.get("/geo-sales", response_model=schemas.GeoSalesList)
+async def read_geo_sales(
+    db: AsyncSession = Depends(deps.get_db),
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    province: str = Query(default=None),
+    level: str = Query(default="city", pattern="^(province|city)$"),
+    current_user: models.User = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    获取按收货省份、城市汇总的销售数据
+    """
+    if not end_date:
+        end_date = datetime.now()
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
+
+    items = await statistics_service.get_geo_sales(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        province=province,
+        by_city=level == "city",
+    )
+    return {"items": items}
+
+@router.get("/refunds", response_model=schemas.RefundStatsList)
+async def read_refund_stats(
+    db: AsyncSession = Depends(deps.get_db),
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    group_by: str = Query(default="type,reason"),
+    type: str = Query(default=None),
+    product_id: int = Query(default=None),
+    current_user: models.User = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    获取售后统计数据，group_by 为逗号分隔的 type、reason、product_id
+    """
+    dimensions = [d for d in group_by.split(",") if d]
+    if not dimensions or any(d not in REFUND_DIMENSIONS for d in dimensions):
+        raise HTTPException(status_code=400, detail="Invalid group_by")
+    if not end_date:
+        end_date = datetime.now()
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
+
+    items = await statistics_service.get_refund_stats(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        group_by=dimensions,
+        type=type,
+        product_id=product_id,
+    )
+    return {"items": items}
+
+@router.get("/category-sales", response_model=schemas.CategorySalesList)
+async def read_category_sales(
+    db: AsyncSession = Depends(deps.get_db),
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    category_id: int = Query(default=None),
+    parent_id: int = Query(default=None),
+    current_user: models.User = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    获取分类销售趋势（分类销售额包含其全部子分类）
+    """
+    if not end_date:
+        end_date = datetime.now()
+    if not start_date:
+        start_date = end_date - timedelta(days=30)
+
+    items = await statistics_service.get_category_sales(
+        db,
+        start_date=start_date,
+        end_date=end_date,
+        category_id=category_id,
+        parent_id=parent_id,
+    )
+    return {"items": items}
+
+@router.get(
+    "/cohorts",
+    response_model=schemas.CohortReport,
+    responses={202: {"description": "报表正在生成，请稍后重试"}},
+)
+async def read_cohort_report(
+    start_date: datetime = Query(default=None),
+    end_date: datetime = Query(default=None),
+    current_user: models.User = Depends(deps.get_current_active_admin),
+) -> Any:
+    """
+    获取同期群留存报表（按首单月份），未缓存时提交后台任务并返回 202
+    """
+    if not end_date:
+        end_date = datetime.now()
+    if not start_date:
+        start_date = end_date - timedelta(days=365)
+    start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+    end_date = end_date.replace(hour=23, minute=59, second=59, microsecond=0)
+
+    report = await report_service.get_cached_cohort_report(start_date, end_date)
+    if report:
+        return report
+    if await report_service.mark_pending(start_date, end_date):
+        generate_cohort_report.delay(start_date.isoformat(), end_date.isoformat())
+    return JSONResponse(status_code=202, content={"detail": "Report is being generated"})
+
 @router.get("/product-rankings", response_model=schemas.ProductRankingList)
-def read_product_rankings(
-    db: Session = Depends(deps.get_db),
+async def read_product_rankings(
+    db: AsyncSession = Depends(deps.get_db),
     date: datetime = Query(default=None),
     skip: int = 0,
     limit: int = 100,
@@ -70,24 +263,22 @@ def read_product_rankings(
     """
     if not date:
         date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    rankings = statistics_service.get_product_rankings(
+
+    rankings = await statistics_service.get_product_rankings(
         db, date=date, skip=skip, limit=limit
     )
-    total = db.query(models.ProductRanking).filter(
-        models.ProductRanking.date == date
-    ).count()
+    total = await statistics_service.count_product_rankings(db, date=date)
     return {"total": total, "items": rankings}
 
 @router.post("/product-rankings", response_model=schemas.ProductRanking)
-def create_product_ranking(
+async def create_product_ranking(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     ranking_in: schemas.ProductRankingCreate,
     current_user: models.User = Depends(deps.get_current_active_admin),
 ) -> Any:
     """
     创建商品排行数据
     """
-    ranking = statistics_service.create_product_ranking(db, ranking_in)
-    return ranking 
\ No newline at end of file
+    ranking = await statistics_service.create_product_ranking(db, obj_in=ranking_in)
+    return ranking
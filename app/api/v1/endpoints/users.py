@@ -3,6 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import models, schemas
 from app.api import deps
+from app.core.cache import principal_cache
+from app.core.tokens import bump_token_version
 from app.services.user import user_service
 
 router = APIRouter()
@@ -44,12 +46,14 @@ async def create_user(
 
 @router.get("/me", response_model=schemas.UserInDB)
 async def read_user_me(
+    db: AsyncSession = Depends(deps.get_db),
     current_user: models.User = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     获取当前用户信息
     """
-    return current_user
+    # current_user 来自用户缓存，不含密码哈希等字段，这里读取完整记录
+    return await user_service.get_user(db=db, user_id=current_user.id)
 
 
 @router.put("/me", response_model=schemas.UserInDB)
@@ -78,7 +82,7 @@ async def read_user_by_id(
     通过ID获取用户信息
     """
     user = await user_service.get_user(db=db, user_id=user_id)
-    if user == current_user:
+    if user and user.id == current_user.id:
         return user
     if not await user_service.is_superuser(current_user):
         raise HTTPException(
@@ -107,4 +111,25 @@ async def update_user(
     user = await user_service.update_user(
         db=db, user_id=user_id, obj_in=user_in
     )
-    return user 
\ No newline at end of file
+    return user 
+
+
+@router.post("/{user_id}/revoke-tokens", response_model=schemas.Msg)
+async def revoke_user_tokens(
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    user_id: int,
+    current_user: models.User = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    吊销用户已签发的全部令牌
+    """
+    user = await user_service.get_user(db=db, user_id=user_id)
+    if not user:
+        raise HTTPException(
+            status_code=404,
+            detail="The user with this username does not exist in the system",
+        )
+    await bump_token_version(user_id)
+    await principal_cache.invalidate(user_id)
+    return {"msg": "已吊销该用户的全部令牌"}
@@ -0,0 +1,290 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+from app.core.config import settings
+from app.core.redis import redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# 用户缓存失效广播频道
+PRINCIPAL_INVALIDATION_CHANNEL = "principal_invalidations"
+
+
+class TTLCache:
+    """
+    进程内 LRU 缓存，条目带过期时间
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def pop_where(self, predicate) -> None:
+        """
+        删除所有键满足条件的条目
+        """
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+class PrincipalCache:
+    """
+    当前登录用户缓存：进程内 LRU + Redis
+
+    以用户ID和令牌为键，仅保存权限判断所需的字段，避免每个请求都查询 users 表。
+    失效通过 pub/sub 广播到每个 worker，清除各自的进程内缓存。
+    """
+
+    # 缓存的用户字段（不包含密码哈希）
+    FIELDS = (
+        "id",
+        "username",
+        "email",
+        "full_name",
+        "nickname",
+        "phone",
+        "avatar",
+        "role",
+        "status",
+        "is_active",
+        "is_superuser",
+    )
+
+    def __init__(self):
+        self.local = TTLCache(
+            maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+            ttl=settings.PRINCIPAL_CACHE_LOCAL_TTL_SECONDS,
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _redis_key(user_id: int) -> str:
+        return f"principal:{user_id}"
+
+    @staticmethod
+    def _token_digest(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()[:32]
+
+    @classmethod
+    def to_user(cls, data: Dict[str, Any]) -> User:
+        """
+        由缓存数据构造（未绑定会话的）用户对象
+        """
+        return User(**{field: data.get(field) for field in cls.FIELDS})
+
+    async def get(self, user_id: int, token: str) -> Optional[User]:
+        """
+        获取缓存的用户，未命中时返回 None
+        """
+        digest = self._token_digest(token)
+        data = self.local.get((user_id, digest))
+        if data is None:
+            try:
+                raw = await redis.hget(self._redis_key(user_id), digest)
+            except Exception as e:
+                logger.warning(f"Principal cache read error: {str(e)}")
+                return None
+            if raw is None:
+                return None
+            data = json.loads(raw)
+            self.local.set((user_id, digest), data)
+        return self.to_user(data)
+
+    async def set(self, user: User, token: str) -> None:
+        """
+        写入缓存
+        """
+        digest = self._token_digest(token)
+        data = {field: getattr(user, field) for field in self.FIELDS}
+        self.local.set((user.id, digest), data)
+        try:
+            key = self._redis_key(user.id)
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.hset(key, digest, json.dumps(data))
+                pipe.expire(key, settings.PRINCIPAL_CACHE_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Principal cache write error: {str(e)}")
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        失效指定用户的全部缓存
+        """
+        self._evict_local(user_id)
+        try:
+            await redis.delete(self._redis_key(user_id))
+            await redis.publish(PRINCIPAL_INVALIDATION_CHANNEL, user_id)
+        except Exception as e:
+            logger.error(f"Principal cache invalidate error: {str(e)}")
+
+    def _evict_local(self, user_id: int) -> None:
+        self.local.pop_where(lambda key: key[0] == user_id)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(PRINCIPAL_INVALIDATION_CHANNEL)
+                # 订阅建立后清空本地缓存，丢弃断线期间可能错过失效的条目
+                self.local.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._evict_local(int(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Principal cache subscriber error: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    async def start(self) -> None:
+        """
+        订阅其他 worker 的失效广播
+        """
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+principal_cache = PrincipalCache()
+
+
+# 仅当锁仍由自己持有时才释放
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_release_lock = redis.register_script(RELEASE_LOCK_SCRIPT)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Redis 缓存，支持 stale-while-revalidate 与单飞（single-flight）刷新
+
+    - 未过期：直接返回缓存值
+    - 已过期但仍在 stale 窗口内：立即返回旧值，并由一个后台任务刷新
+    - 不存在：只有拿到锁的请求执行计算，其余请求等待结果
+    所有 worker 通过 Redis 锁协调，同一时刻最多一次重新计算。
+    compute 的返回值必须可 JSON 序列化。
+    """
+
+    def __init__(
+        self,
+        key: str,
+        *,
+        ttl: int,
+        stale_ttl: int,
+        lock_ttl: int = 30,
+        wait_timeout: float = 10,
+    ):
+        self.key = key
+        self.lock_key = f"{key}:lock"
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self._tasks = set()
+
+    async def _acquire(self) -> Optional[str]:
+        token = uuid.uuid4().hex
+        if await redis.set(self.lock_key, token, nx=True, ex=self.lock_ttl):
+            return token
+        return None
+
+    async def _refresh(self, compute: Callable[[], Awaitable[Any]], token: str) -> Any:
+        try:
+            value = await compute()
+            entry = {"value": value, "fresh_until": time.time() + self.ttl}
+            await redis.set(self.key, json.dumps(entry), ex=self.ttl + self.stale_ttl)
+            return value
+        finally:
+            await _release_lock(keys=[self.lock_key], args=[token])
+
+    async def _background_refresh(self, compute: Callable[[], Awaitable[Any]]) -> None:
+        try:
+            token = await self._acquire()
+            if token:
+                await self._refresh(compute, token)
+        except Exception as e:
+            logger.error(f"Cache refresh error ({self.key}): {str(e)}")
+
+    async def get(self, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        读取缓存值，必要时计算或在后台刷新
+        """
+        try:
+            raw = await redis.get(self.key)
+        except Exception as e:
+            logger.warning(f"Cache read error ({self.key}): {str(e)}")
+            return await compute()
+
+        if raw is not None:
+            entry = json.loads(raw)
+            if entry["fresh_until"] < time.time():
+                task = asyncio.create_task(self._background_refresh(compute))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+            return entry["value"]
+
+        token = await self._acquire()
+        if token:
+            return await self._refresh(compute, token)
+
+        # 其他请求正在计算，等待其写入结果
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            raw = await redis.get(self.key)
+            if raw is not None:
+                return json.loads(raw)["value"]
+        return await compute()
+
+    async def invalidate(self) -> None:
+        await redis.delete(self.key)
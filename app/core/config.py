@@ -11,8 +11,18 @@ load_dotenv()
 class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     SECRET_KEY: str = "your-secret-key-here"
-    # 60 minutes * 24 hours * 8 days = 8 days
-    ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # 访问令牌有效期较短，过期后使用刷新令牌换取
+    ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 7
+    # 令牌版本号的进程内缓存时间（秒），即禁用用户后旧令牌最长的可用时间
+    TOKEN_VERSION_LOCAL_TTL_SECONDS: int = 5
+    # 令牌吊销列表布隆过滤器容量、误判率及重建间隔（秒）
+    REVOCATION_BLOOM_CAPACITY: int = 100000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    REVOCATION_REBUILD_SECONDS: int = 600
+    # 密码哈希执行器：thread 或 process
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
     # BACKEND_CORS_ORIGINS is a JSON-formatted list of origins
     # e.g: '["http://localhost", "http://localhost:4200", "http://localhost:3000"]'
     BACKEND_CORS_ORIGINS: List[AnyHttpUrl] = []
@@ -61,6 +71,12 @@ class Settings(BaseSettings):
     EMAILS_FROM_EMAIL: Optional[EmailStr] = None
     EMAILS_FROM_NAME: Optional[str] = None
 
+    SMTP_TIMEOUT_SECONDS: int = 10
+    # 邮件队列与 SMTP 连接池配置
+    MAIL_QUEUE: str = "email"
+    SMTP_POOL_SIZE: int = 4
+    SMTP_POOL_IDLE_SECONDS: int = 60
+
     EMAIL_RESET_TOKEN_EXPIRE_HOURS: int = 48
     EMAIL_TEMPLATES_DIR: str = "/app/email-templates"
     EMAILS_ENABLED: bool = False
@@ -95,6 +111,57 @@ class Settings(BaseSettings):
         password = f":{values.get('REDIS_PASSWORD')}@" if values.get("REDIS_PASSWORD") else ""
         return f"redis://{password}{values.get('REDIS_HOST')}:{values.get('REDIS_PORT')}/{values.get('REDIS_DB')}"
 
+    # 当前用户缓存配置
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 300
+    PRINCIPAL_CACHE_LOCAL_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_SIZE: int = 1024
+
+    # 仪表盘缓存：新鲜期与过期后仍可返回旧值的时长（秒）
+    DASHBOARD_CACHE_TTL_SECONDS: int = 30
+    DASHBOARD_CACHE_STALE_SECONDS: int = 600
+
+    # 当日实时计数器：Redis 键保留时长与对账间隔（秒）
+    DAILY_COUNTERS_TTL_SECONDS: int = 172800
+    DAILY_COUNTERS_RECONCILE_SECONDS: int = 300
+
+    # 实时事件推送（SSE）：心跳间隔（秒）与每个客户端的事件队列长度
+    SSE_HEARTBEAT_SECONDS: int = 15
+    SSE_CLIENT_QUEUE_SIZE: int = 100
+
+    # 分析报表：读取订单的批大小、结果缓存时长与生成任务超时（秒）
+    REPORT_CHUNK_SIZE: int = 50000
+    REPORT_CACHE_TTL_SECONDS: int = 3600
+    REPORT_TASK_TIMEOUT_SECONDS: int = 600
+
+    # 热点 SKU 库存预占：未支付预占的保留时长、超时释放与销量同步的间隔（秒）
+    INVENTORY_RESERVATION_TTL_SECONDS: int = 900
+    INVENTORY_RELEASE_INTERVAL_SECONDS: int = 60
+    INVENTORY_SYNC_INTERVAL_SECONDS: int = 30
+
+    # 订单号生成：worker id 数量上限（不超过 10000）与租约时长（秒）
+    ORDER_NO_MAX_WORKERS: int = 1024
+    ORDER_NO_LEASE_TTL_SECONDS: int = 60
+
+    # 幂等键：处理中锁的时长（处理期间自动续期）与响应保留时长（秒）
+    IDEMPOTENCY_LOCK_TTL_SECONDS: int = 60
+    IDEMPOTENCY_KEY_TTL_SECONDS: int = 86400
+
+    # 限流配置（次数 / 窗口秒数）
+    LOGIN_RATE_LIMIT: int = 10
+    LOGIN_RATE_LIMIT_WINDOW_SECONDS: int = 60
+    PASSWORD_RECOVERY_RATE_LIMIT: int = 3
+    PASSWORD_RECOVERY_RATE_LIMIT_WINDOW_SECONDS: int = 3600
+    # 可信反向代理的地址或网段，只有来自这些地址的 X-Forwarded-For 才会被采用
+    TRUSTED_PROXIES: List[str] = []
+    # Redis 不可用时进程内限流记录的最大键数
+    LOCAL_RATE_LIMIT_MAX_KEYS: int = 10000
+
+    @validator("TRUSTED_PROXIES", pre=True)
+    def assemble_trusted_proxies(cls, v: Union[str, List[str]]) -> List[str]:
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        return v
+
     # Celery配置
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/0"
@@ -0,0 +1,67 @@
+import logging
+from datetime import date, datetime
+from typing import Dict, Union
+
+from app.core.config import settings
+from app.core.redis import redis
+
+logger = logging.getLogger(__name__)
+
+# 计数字段与 SalesTrend 列同名
+INT_FIELDS = ("order_count", "user_count", "refund_count")
+FLOAT_FIELDS = ("sales_amount", "refund_amount")
+
+
+class DailyCounters:
+    """
+    按天维护的实时统计计数器
+
+    每天一个 Redis 哈希 stats:daily:{YYYYMMDD}，由下单、支付状态变更、用户注册和
+    售后完成时增量更新；定时对账任务会用数据库的结果覆盖，修正偏差。
+    日期一律按 UTC 计算，与数据库中的 created_at 等时间字段一致。
+    """
+
+    @staticmethod
+    def _key(day: Union[date, datetime]) -> str:
+        return f"stats:daily:{day:%Y%m%d}"
+
+    async def incr(self, day: Union[date, datetime], **deltas: float) -> None:
+        """
+        原子地累加一个或多个计数，写入失败只记录日志，由对账任务修正
+        """
+        key = self._key(day)
+        try:
+            async with redis.pipeline(transaction=True) as pipe:
+                for field, delta in deltas.items():
+                    if field in INT_FIELDS:
+                        pipe.hincrby(key, field, int(delta))
+                    else:
+                        pipe.hincrbyfloat(key, field, float(delta))
+                pipe.expire(key, settings.DAILY_COUNTERS_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(f"Daily counter update error ({key}): {str(e)}")
+
+    async def get(self, day: Union[date, datetime]) -> Dict[str, float]:
+        """
+        读取某天的计数，不存在时返回空字典
+        """
+        data = await redis.hgetall(self._key(day))
+        return {
+            field: int(value) if field in INT_FIELDS else float(value)
+            for field, value in data.items()
+        }
+
+    async def overwrite(self, day: Union[date, datetime], values: Dict[str, float]) -> None:
+        """
+        用数据库统计结果覆盖某天的计数
+        """
+        key = self._key(day)
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping={field: values[field] for field in INT_FIELDS + FLOAT_FIELDS})
+            pipe.expire(key, settings.DAILY_COUNTERS_TTL_SECONDS)
+            await pipe.execute()
+
+
+daily_counters = DailyCounters()
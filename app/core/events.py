@@ -0,0 +1,83 @@
+import asyncio
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Set
+
+from app.core.config import settings
+from app.core.redis import redis
+
+logger = logging.getLogger(__name__)
+
+# 仪表盘实时事件频道
+DASHBOARD_EVENTS_CHANNEL = "dashboard_events"
+
+
+class EventBroadcaster:
+    """
+    实时事件广播
+
+    事件通过 Redis pub/sub 在所有 worker 之间传递；每个 worker 只保持一个订阅，
+    再分发给本 worker 上所有已连接客户端的队列。
+    """
+
+    def __init__(self, channel: str):
+        self.channel = channel
+        self._queues: Set[asyncio.Queue] = set()
+        self._task = None
+
+    async def publish(self, event: str, data: Dict[str, Any]) -> None:
+        """
+        发布事件，失败只记录日志，不影响业务流程
+        """
+        try:
+            await redis.publish(self.channel, json.dumps({"event": event, "data": data}, default=str))
+        except Exception as e:
+            logger.warning(f"Event publish error ({event}): {str(e)}")
+
+    def _dispatch(self, message: str) -> None:
+        for queue in self._queues:
+            if queue.full():
+                # 客户端消费过慢时丢弃最旧的事件
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._dispatch(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event subscriber error: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[asyncio.Queue]:
+        """
+        注册一个客户端队列，队列中的元素为 JSON 字符串 {"event": ..., "data": ...}
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.SSE_CLIENT_QUEUE_SIZE)
+        self._queues.add(queue)
+        try:
+            yield queue
+        finally:
+            self._queues.discard(queue)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+dashboard_events = EventBroadcaster(DASHBOARD_EVENTS_CHANNEL)
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import json
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Optional, Type
+
+from fastapi import Header, HTTPException, Request, status
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import redis
+from app.models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+# KEYS: 幂等记录; ARGV: 本次请求的标识；只删除本次请求加的锁
+UNLOCK_SCRIPT = """
+local record = redis.call('GET', KEYS[1])
+if record and cjson.decode(record)['token'] == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# KEYS: 幂等记录; ARGV: 本次请求的标识, 锁时长（秒）；只续期本次请求加的锁
+RENEW_SCRIPT = """
+local record = redis.call('GET', KEYS[1])
+if record and cjson.decode(record)['token'] == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_unlock = redis.register_script(UNLOCK_SCRIPT)
+_renew = redis.register_script(RENEW_SCRIPT)
+
+
+class IdempotentRequest:
+    """
+    一次携带 Idempotency-Key 的请求，未携带时直接执行
+    """
+
+    def __init__(self, scope: str, key: Optional[str], fingerprint: str):
+        self.scope = scope
+        self.key = key
+        self.fingerprint = fingerprint
+        self.owner: Optional[int] = None
+
+    def record(self, db: AsyncSession, resource_id: int) -> None:
+        """
+        在业务事务中写入幂等键，随业务数据一同提交
+
+        唯一约束保证同一个键最多提交一次，锁过期后的重复请求会在提交时失败
+        """
+        if self.key:
+            db.add(IdempotencyKey(
+                scope=self.scope,
+                owner_id=self.owner,
+                key=self.key,
+                fingerprint=self.fingerprint,
+                resource_id=resource_id,
+            ))
+
+    async def _committed(self, db: AsyncSession) -> Optional[IdempotencyKey]:
+        result = await db.execute(
+            select(IdempotencyKey).filter(
+                IdempotencyKey.scope == self.scope,
+                IdempotencyKey.owner_id == self.owner,
+                IdempotencyKey.key == self.key,
+            )
+        )
+        return result.scalar_one_or_none()
+
+    def _check_fingerprint(self, fingerprint: str) -> None:
+        if fingerprint != self.fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key 已用于不同的请求内容",
+            )
+
+    async def _keep_locked(self, record_key: str, token: str) -> None:
+        ttl = settings.IDEMPOTENCY_LOCK_TTL_SECONDS
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                await _renew(keys=[record_key], args=[token, ttl])
+            except Exception as e:
+                logger.warning(f"Idempotency lock renewal error ({record_key}): {str(e)}")
+
+    async def run(
+        self,
+        db: AsyncSession,
+        owner: int,
+        create: Callable[[], Awaitable[Any]],
+        load: Callable[[int], Awaitable[Any]],
+        response_model: Type[BaseModel],
+    ) -> Any:
+        """
+        执行 create 并保存序列化后的响应，重试时直接返回第一次请求的结果
+
+        create 需在提交业务数据前调用 record。第一次请求处理期间（锁会持续续期）的重试
+        返回 409；create 失败时只有确认幂等键未提交才释放锁，否则按已提交的资源返回
+        """
+        self.owner = owner
+        if not self.key:
+            return await create()
+
+        record_key = f"idempotency:{self.scope}:{owner}:{self.key}"
+        token = uuid.uuid4().hex
+        locked = await redis.set(
+            record_key,
+            json.dumps({"token": token, "fingerprint": self.fingerprint}),
+            nx=True,
+            ex=settings.IDEMPOTENCY_LOCK_TTL_SECONDS,
+        )
+        if not locked:
+            return await self._replay(db, record_key, load, response_model)
+
+        renewal = asyncio.create_task(self._keep_locked(record_key, token))
+        try:
+            try:
+                result = await create()
+            except Exception:
+                await db.rollback()
+                # 查询失败时保留锁直到过期，由唯一约束兜底
+                committed = await self._committed(db)
+                if committed is None:
+                    await _unlock(keys=[record_key], args=[token])
+                    raise
+                # 提交后的步骤失败，或锁过期后另一个请求已提交：返回已提交的资源
+                self._check_fingerprint(committed.fingerprint)
+                result = await load(committed.resource_id)
+            response = jsonable_encoder(response_model.model_validate(result))
+        finally:
+            renewal.cancel()
+
+        try:
+            await redis.set(
+                record_key,
+                json.dumps({
+                    "token": token,
+                    "fingerprint": self.fingerprint,
+                    "response": response,
+                }),
+                ex=settings.IDEMPOTENCY_KEY_TTL_SECONDS,
+            )
+        except Exception as e:
+            logger.error(f"Idempotency record save error ({record_key}): {str(e)}")
+        return response
+
+    async def _replay(
+        self,
+        db: AsyncSession,
+        record_key: str,
+        load: Callable[[int], Awaitable[Any]],
+        response_model: Type[BaseModel],
+    ) -> Any:
+        raw = await redis.get(record_key)
+        record = json.loads(raw) if raw is not None else None
+        if record is not None:
+            self._check_fingerprint(record["fingerprint"])
+            if "response" in record:
+                return record["response"]
+
+        # Redis 中没有结果（仍在处理、结果写入失败或记录已过期）时以数据库为准
+        committed = await self._committed(db)
+        if committed is not None:
+            self._check_fingerprint(committed.fingerprint)
+            return jsonable_encoder(response_model.model_validate(await load(committed.resource_id)))
+        if record is not None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="请求正在处理中，请稍后重试",
+                headers={"Retry-After": "1"},
+            )
+        # 第一次请求刚刚失败并释放了锁
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="请求处理失败，请重试",
+        )
+
+
+class Idempotency:
+    """
+    基于 Redis 和数据库的幂等键依赖
+
+    客户端在 Idempotency-Key 请求头中为每个逻辑请求提供唯一值，同一用户使用同一键
+    的重试不会重复写库，而是返回第一次请求的响应。Redis 保存处理中的锁和响应，
+    幂等键表与业务数据同事务提交，是请求是否已生效的依据。请求体不同时视为误用键，返回 422。
+    """
+
+    def __init__(self, scope: str):
+        self.scope = scope
+
+    async def __call__(
+        self,
+        request: Request,
+        idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=128),
+    ) -> IdempotentRequest:
+        fingerprint = ""
+        if idempotency_key:
+            fingerprint = hashlib.sha256(await request.body()).hexdigest()
+        return IdempotentRequest(self.scope, idempotency_key, fingerprint)
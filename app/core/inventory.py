@@ -0,0 +1,251 @@
+import logging
+import time
+import uuid
+from typing import Dict, List, Set, Tuple
+
+from app.core.config import settings
+from app.core.redis import redis
+
+logger = logging.getLogger(__name__)
+
+HOT_SKUS_KEY = "inventory:hot_skus"
+STOCK_KEY_PREFIX = "inventory:stock:"
+RESERVATIONS_KEY = "inventory:reservations"
+PENDING_KEY = "inventory:pending"
+PROCESSING_KEY = "inventory:pending:processing"
+# 同步中批次的标识，数据库按此跳过已应用的批次
+BATCH_KEY = "inventory:pending:batch"
+# 各 SKU 尚未确认或释放的预占数量
+RESERVED_KEY = "inventory:reserved"
+
+# KEYS: 预占记录, 预占过期集合, 各 SKU 预占数量, 各 SKU 库存键; ARGV: 订单号, 过期时间, 依次为 sku, 数量
+RESERVE_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+local n = #KEYS - 3
+for i = 1, n do
+    local stock = tonumber(redis.call('GET', KEYS[i + 3]))
+    if stock == nil or stock < tonumber(ARGV[i * 2 + 2]) then
+        return ARGV[i * 2 + 1]
+    end
+end
+for i = 1, n do
+    redis.call('DECRBY', KEYS[i + 3], ARGV[i * 2 + 2])
+    redis.call('HSET', KEYS[1], ARGV[i * 2 + 1], ARGV[i * 2 + 2])
+    redis.call('HINCRBY', KEYS[3], ARGV[i * 2 + 1], ARGV[i * 2 + 2])
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 0
+"""
+
+# KEYS: 预占记录, 预占过期集合, 各 SKU 预占数量; ARGV: 订单号, 库存键前缀
+RELEASE_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[1])
+if #items == 0 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    return 0
+end
+for i = 1, #items, 2 do
+    local key = ARGV[2] .. items[i]
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBY', key, items[i + 1])
+    end
+    if redis.call('HINCRBY', KEYS[3], items[i], -items[i + 1]) <= 0 then
+        redis.call('HDEL', KEYS[3], items[i])
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: 预占记录, 预占过期集合, 各 SKU 预占数量, 待同步数据库的销量; ARGV: 订单号
+CONFIRM_SCRIPT = """
+local items = redis.call('HGETALL', KEYS[1])
+if #items == 0 then
+    return 0
+end
+for i = 1, #items, 2 do
+    redis.call('HINCRBY', KEYS[4], items[i], items[i + 1])
+    if redis.call('HINCRBY', KEYS[3], items[i], -items[i + 1]) <= 0 then
+        redis.call('HDEL', KEYS[3], items[i])
+    end
+end
+redis.call('DEL', KEYS[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+return 1
+"""
+
+# KEYS: 热点集合, 库存键, 待同步, 同步中; ARGV: sku, 数据库库存
+# 已是热点时保持 Redis 中的库存不变，否则以数据库库存减去尚未同步的销量为初值
+LOAD_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    local unsynced = tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or 0)
+        + tonumber(redis.call('HGET', KEYS[4], ARGV[1]) or 0)
+    redis.call('SET', KEYS[2], math.max(tonumber(ARGV[2]) - unsynced, 0))
+end
+redis.call('SADD', KEYS[1], ARGV[1])
+return tonumber(redis.call('GET', KEYS[2]))
+"""
+
+# KEYS: 热点集合, 库存键, 各 SKU 预占数量, 待同步, 同步中; ARGV: sku
+# 仍有未结束的预占或未同步的销量时拒绝取消热点
+UNLOAD_SCRIPT = """
+if tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or 0) > 0
+    or redis.call('HEXISTS', KEYS[4], ARGV[1]) == 1
+    or redis.call('HEXISTS', KEYS[5], ARGV[1]) == 1 then
+    return 0
+end
+redis.call('SREM', KEYS[1], ARGV[1])
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+# KEYS: 待同步, 同步中, 批次标识; ARGV: 新批次标识
+# 上一次同步未确认时继续返回其批次标识和内容，否则将待同步销量转为新批次
+TAKE_PENDING_SCRIPT = """
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        return {}
+    end
+    redis.call('RENAME', KEYS[1], KEYS[2])
+    redis.call('SET', KEYS[3], ARGV[1])
+end
+if redis.call('EXISTS', KEYS[3]) == 0 then
+    redis.call('SET', KEYS[3], ARGV[1])
+end
+local result = {redis.call('GET', KEYS[3])}
+for _, value in ipairs(redis.call('HGETALL', KEYS[2])) do
+    table.insert(result, value)
+end
+return result
+"""
+
+_reserve = redis.register_script(RESERVE_SCRIPT)
+_release = redis.register_script(RELEASE_SCRIPT)
+_confirm = redis.register_script(CONFIRM_SCRIPT)
+_take_pending = redis.register_script(TAKE_PENDING_SCRIPT)
+_load = redis.register_script(LOAD_SCRIPT)
+_unload = redis.register_script(UNLOAD_SCRIPT)
+
+
+def _reservation_key(order_no: str) -> str:
+    return f"inventory:reservation:{order_no}"
+
+
+class InventoryEngine:
+    """
+    热点 SKU 的 Redis 库存预占
+
+    热点 SKU 的可售库存保存在 Redis，下单时用 Lua 脚本一次往返完成全部 SKU 的
+    检查和扣减，不占用数据库行锁。订单支付后预占转为待同步销量，由定时任务批量
+    扣减数据库库存；超时未支付的预占由定时任务释放。
+    热点期间数据库中的 ProductSKU.stock 不再是可售库存，修改库存需先取消热点。
+    """
+
+    async def hot_skus(self) -> Set[int]:
+        return {int(sku_id) for sku_id in await redis.smembers(HOT_SKUS_KEY)}
+
+    async def load(self, sku_id: int, stock: int) -> int:
+        """
+        将 SKU 设为热点并载入库存，返回 Redis 中的可售库存
+
+        stock 为数据库库存，需在锁定 SKU 行后读取，避免与销量同步交错；
+        已确认但尚未同步到数据库的销量会从中扣除
+        """
+        result = await _load(
+            keys=[HOT_SKUS_KEY, f"{STOCK_KEY_PREFIX}{sku_id}", PENDING_KEY, PROCESSING_KEY],
+            args=[sku_id, stock],
+        )
+        return int(result)
+
+    async def unload(self, sku_id: int) -> None:
+        """
+        取消热点，之后该 SKU 的库存重新由数据库扣减
+
+        仍有未结束的预占或未同步的销量时抛出 ValueError，需等待其支付、释放和同步完成
+        """
+        result = await _unload(
+            keys=[
+                HOT_SKUS_KEY,
+                f"{STOCK_KEY_PREFIX}{sku_id}",
+                RESERVED_KEY,
+                PENDING_KEY,
+                PROCESSING_KEY,
+            ],
+            args=[sku_id],
+        )
+        if result != 1:
+            raise ValueError("SKU仍有未完成的预占或未同步的销量，请稍后再取消热点")
+
+    async def reserve(self, order_no: str, quantities: Dict[int, int]) -> None:
+        """
+        为订单预占库存，任一 SKU 库存不足时不做任何扣减并抛出 ValueError
+        """
+        sku_ids = sorted(quantities)
+        args = [order_no, int(time.time()) + settings.INVENTORY_RESERVATION_TTL_SECONDS]
+        for sku_id in sku_ids:
+            args += [sku_id, quantities[sku_id]]
+        result = await _reserve(
+            keys=[_reservation_key(order_no), RESERVATIONS_KEY, RESERVED_KEY]
+            + [f"{STOCK_KEY_PREFIX}{sku_id}" for sku_id in sku_ids],
+            args=args,
+        )
+        if result != 0:
+            raise ValueError("库存不足")
+
+    async def release(self, order_no: str) -> bool:
+        """
+        释放订单的预占库存，预占不存在（已确认或已释放）时返回 False
+        """
+        result = await _release(
+            keys=[_reservation_key(order_no), RESERVATIONS_KEY, RESERVED_KEY],
+            args=[order_no, STOCK_KEY_PREFIX],
+        )
+        return result == 1
+
+    async def confirm(self, order_no: str) -> bool:
+        """
+        订单支付后确认预占，计入待同步数据库的销量
+        """
+        result = await _confirm(
+            keys=[_reservation_key(order_no), RESERVATIONS_KEY, RESERVED_KEY, PENDING_KEY],
+            args=[order_no],
+        )
+        return result == 1
+
+    async def reserved(self, order_no: str) -> Dict[int, int]:
+        """
+        返回订单在 Redis 中预占的各 SKU 数量，没有预占时返回空字典
+        """
+        items = await redis.hgetall(_reservation_key(order_no))
+        return {int(sku_id): int(quantity) for sku_id, quantity in items.items()}
+
+    async def expired(self, limit: int = 500) -> List[str]:
+        """
+        返回已超时的预占订单号
+        """
+        return await redis.zrangebyscore(
+            RESERVATIONS_KEY, "-inf", int(time.time()), start=0, num=limit
+        )
+
+    async def take_pending(self) -> Tuple[str, Dict[int, int]]:
+        """
+        取出待同步数据库的销量及其批次标识，同步成功后需调用 ack_pending
+
+        未确认的批次会以相同的标识再次返回，没有待同步销量时返回空标识和空字典
+        """
+        result = await _take_pending(
+            keys=[PENDING_KEY, PROCESSING_KEY, BATCH_KEY], args=[uuid.uuid4().hex]
+        )
+        if not result:
+            return "", {}
+        batch_id, items = result[0], result[1:]
+        return batch_id, {int(items[i]): int(items[i + 1]) for i in range(0, len(items), 2)}
+
+    async def ack_pending(self) -> None:
+        await redis.delete(PROCESSING_KEY, BATCH_KEY)
+
+
+inventory = InventoryEngine()
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import settings
+from app.core.redis import redis
+
+logger = logging.getLogger(__name__)
+
+WORKER_KEY_PREFIX = "order_no:worker:"
+
+# 每毫秒最多生成的序号数，序号用 3 位十进制表示
+SEQUENCE_LIMIT = 1000
+
+# KEYS: worker 租约; ARGV: 持有者标识, 租约时长（秒）
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: worker 租约; ARGV: 持有者标识
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_renew = redis.register_script(RENEW_SCRIPT)
+_release = redis.register_script(RELEASE_SCRIPT)
+
+
+class OrderNoGenerator:
+    """
+    Snowflake 风格的订单号生成器
+
+    订单号为 24 位数字：毫秒时间（YYYYMMDDHHMMSSfff）+ 4 位 worker id + 3 位序号，
+    按时间有序且可直接读出下单时间。worker id 在启动时从 Redis 租用并定期续期，
+    生成订单号只在本地计算，不访问网络；租约失效后停止生成，避免与其他进程重号。
+    """
+
+    def __init__(self):
+        self.worker_id: Optional[int] = None
+        self._token = ""
+        self._lease_deadline = 0.0
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(worker_id: int) -> str:
+        return f"{WORKER_KEY_PREFIX}{worker_id}"
+
+    async def _acquire(self) -> None:
+        """
+        从随机位置开始依次尝试租用空闲的 worker id
+        """
+        ttl = settings.ORDER_NO_LEASE_TTL_SECONDS
+        start = random.randrange(settings.ORDER_NO_MAX_WORKERS)
+        for i in range(settings.ORDER_NO_MAX_WORKERS):
+            worker_id = (start + i) % settings.ORDER_NO_MAX_WORKERS
+            if await redis.set(self._key(worker_id), self._token, nx=True, ex=ttl):
+                self.worker_id = worker_id
+                self._lease_deadline = time.monotonic() + ttl
+                return
+        raise RuntimeError("没有可用的订单号 worker id")
+
+    async def _keep_alive(self) -> None:
+        ttl = settings.ORDER_NO_LEASE_TTL_SECONDS
+        while True:
+            await asyncio.sleep(ttl / 3)
+            try:
+                renewed_at = time.monotonic()
+                if await _renew(keys=[self._key(self.worker_id)], args=[self._token, ttl]):
+                    self._lease_deadline = renewed_at + ttl
+                else:
+                    logger.warning(f"Order number worker id {self.worker_id} lease lost, reacquiring")
+                    await self._acquire()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Order number lease renewal error: {str(e)}")
+
+    async def start(self) -> None:
+        """
+        租用 worker id 并启动续期
+        """
+        self._token = uuid.uuid4().hex
+        await self._acquire()
+        self._task = asyncio.create_task(self._keep_alive())
+        logger.info(f"Order number worker id: {self.worker_id}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self.worker_id is not None:
+            await _release(keys=[self._key(self.worker_id)], args=[self._token])
+            self.worker_id = None
+
+    def generate(self) -> str:
+        """
+        生成订单号
+
+        时钟回拨或同一毫秒序号用尽时沿用并递增上一次的时间，保证单调不重复
+        """
+        with self._lock:
+            if self.worker_id is None or time.monotonic() >= self._lease_deadline:
+                raise RuntimeError("订单号生成器未持有有效的 worker id")
+            now_ms = int(time.time() * 1000)
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                self._sequence += 1
+                if self._sequence >= SEQUENCE_LIMIT:
+                    self._last_ms += 1
+                    self._sequence = 0
+            ms, sequence, worker_id = self._last_ms, self._sequence, self.worker_id
+
+        timestamp = datetime.fromtimestamp(ms / 1000).strftime("%Y%m%d%H%M%S")
+        return f"{timestamp}{ms % 1000:03d}{worker_id:04d}{sequence:03d}"
+
+
+order_no_generator = OrderNoGenerator()
@@ -0,0 +1,157 @@
+import ipaddress
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Callable, Deque, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from app.core.config import settings
+from app.core.redis import redis
+
+logger = logging.getLogger(__name__)
+
+# 滑动窗口限流脚本：清理窗口外的记录，未超限时记录本次请求
+# 返回 0 表示放行，否则返回需要等待的毫秒数
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    return tonumber(oldest[2]) + window - now
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return 0
+"""
+
+_sliding_window = redis.register_script(SLIDING_WINDOW_SCRIPT)
+
+
+class LocalSlidingWindow:
+    """
+    进程内滑动窗口，Redis 不可用时的降级实现
+
+    窗口内已无记录的键会被删除，键数超过上限时淘汰最久未访问的键
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        # 键 -> (窗口毫秒数, 请求时间)，按最近访问排序
+        self._hits: "OrderedDict[str, Tuple[int, Deque[float]]]" = OrderedDict()
+        self._lock = Lock()
+
+    def _prune(self, now: float) -> None:
+        # 从最久未访问的键开始，删除窗口内已无记录的键
+        while self._hits:
+            key, (window_ms, hits) = next(iter(self._hits.items()))
+            if hits and hits[-1] > now - window_ms and len(self._hits) <= self.max_keys:
+                break
+            del self._hits[key]
+
+    def hit(self, key: str, limit: int, window_ms: int) -> int:
+        now = time.monotonic() * 1000
+        with self._lock:
+            _, hits = self._hits.pop(key, (window_ms, deque()))
+            while hits and hits[0] <= now - window_ms:
+                hits.popleft()
+            if len(hits) >= limit:
+                retry_after = int(hits[0] + window_ms - now) or 1
+            else:
+                hits.append(now)
+                retry_after = 0
+            self._hits[key] = (window_ms, hits)
+            self._prune(now)
+            return retry_after
+
+
+_local_window = LocalSlidingWindow(settings.LOCAL_RATE_LIMIT_MAX_KEYS)
+
+_trusted_proxies = [
+    ipaddress.ip_network(proxy, strict=False) for proxy in settings.TRUSTED_PROXIES
+]
+
+
+def _is_trusted_proxy(host: str) -> bool:
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in _trusted_proxies)
+
+
+def get_client_ip(request: Request) -> str:
+    """
+    获取客户端IP
+
+    仅当直接连接方是可信代理时才采用 X-Forwarded-For，并从右向左跳过可信代理，
+    取第一个不可信的地址；客户端自行添加的值位于左侧，无法伪造结果
+    """
+    host = request.client.host if request.client else "unknown"
+    if not _is_trusted_proxy(host):
+        return host
+    forwarded = request.headers.get("x-forwarded-for")
+    if not forwarded:
+        return host
+    for address in reversed([a.strip() for a in forwarded.split(",") if a.strip()]):
+        if not _is_trusted_proxy(address):
+            return address
+    return host
+
+
+class RateLimiter:
+    """
+    基于 Redis 滑动窗口的限流依赖
+
+    作为依赖使用时按客户端IP限流，key_func 可额外提供一个维度（如邮箱），
+    也可以在接口中调用 check 对任意维度（如用户名）限流。
+    """
+
+    def __init__(
+        self,
+        scope: str,
+        *,
+        limit: int,
+        window_seconds: int,
+        key_func: Optional[Callable[[Request], Optional[str]]] = None,
+    ):
+        self.scope = scope
+        self.limit = limit
+        self.window_ms = window_seconds * 1000
+        self.key_func = key_func
+
+    async def _hit(self, key: str) -> int:
+        try:
+            return int(
+                await _sliding_window(
+                    keys=[key],
+                    args=[int(time.time() * 1000), self.window_ms, self.limit, uuid.uuid4().hex],
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Rate limiter falling back to local window: {str(e)}")
+            return _local_window.hit(key, self.limit, self.window_ms)
+
+    async def check(self, dimension: str, value: str) -> None:
+        """
+        记录一次请求，超出限制时抛出 429
+        """
+        retry_after_ms = await self._hit(f"rate_limit:{self.scope}:{dimension}:{value}")
+        if retry_after_ms > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="请求过于频繁，请稍后再试",
+                headers={"Retry-After": str(max(1, retry_after_ms // 1000))},
+            )
+
+    async def __call__(self, request: Request) -> None:
+        await self.check("ip", get_client_ip(request))
+        if self.key_func:
+            value = self.key_func(request)
+            if value:
+                await self.check("key", value.lower())
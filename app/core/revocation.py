@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+
+from app.core.config import settings
+from app.core.redis import redis
+
+logger = logging.getLogger(__name__)
+
+# 已吊销 jti 的有序集合（分值为令牌过期时间戳）及广播频道
+REVOKED_JTIS_KEY = "revoked_jtis"
+REVOCATION_CHANNEL = "token_revocations"
+
+
+class BloomFilter:
+    """
+    简单的布隆过滤器，只会误判"可能存在"，不会漏判
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:], "big") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationList:
+    """
+    JWT 吊销列表
+
+    吊销的 jti 保存在 Redis，并通过 pub/sub 同步到每个 worker 的布隆过滤器。
+    未被吊销的令牌（绝大多数请求）只需本地判断，无需访问网络。
+    """
+
+    def __init__(self):
+        self._filter = self._new_filter()
+        self._tasks = []
+        # 进行中的重建各自的缓冲区，收集重建期间广播的 jti
+        self._rebuild_buffers = []
+
+    @staticmethod
+    def _new_filter() -> BloomFilter:
+        return BloomFilter(
+            settings.REVOCATION_BLOOM_CAPACITY, settings.REVOCATION_BLOOM_ERROR_RATE
+        )
+
+    async def revoke(self, jti: str, expires_at: int) -> None:
+        """
+        吊销令牌，expires_at 为令牌过期时间戳，过期后记录会被清理
+        """
+        await redis.zadd(REVOKED_JTIS_KEY, {jti: expires_at})
+        await redis.publish(REVOCATION_CHANNEL, jti)
+        self._add(jti)
+
+    async def is_revoked(self, jti: str) -> bool:
+        """
+        判断令牌是否已被吊销
+        """
+        if jti not in self._filter:
+            return False
+        # 布隆过滤器命中时到 Redis 确认，排除误判
+        return await redis.zscore(REVOKED_JTIS_KEY, jti) is not None
+
+    async def rebuild(self) -> None:
+        """
+        清理已过期的记录并重建布隆过滤器
+        """
+        buffer = []
+        self._rebuild_buffers.append(buffer)
+        try:
+            await redis.zremrangebyscore(REVOKED_JTIS_KEY, 0, int(time.time()))
+            bloom = self._new_filter()
+            async for jti in redis.zscan_iter(REVOKED_JTIS_KEY):
+                bloom.add(jti[0])
+            # 扫描期间收到的吊销可能已被扫描跳过，替换前补入新过滤器
+            for jti in buffer:
+                bloom.add(jti)
+            self._filter = bloom
+        finally:
+            self._rebuild_buffers.remove(buffer)
+
+    def _add(self, jti: str) -> None:
+        self._filter.add(jti)
+        for buffer in self._rebuild_buffers:
+            buffer.append(jti)
+
+    async def _listen(self) -> None:
+        while True:
+            pubsub = redis.pubsub()
+            try:
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                # 订阅建立后重建一次，补上断线期间错过的消息
+                await self.rebuild()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self._add(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Revocation subscriber error: {str(e)}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+
+    async def _periodic_rebuild(self) -> None:
+        while True:
+            await asyncio.sleep(settings.REVOCATION_REBUILD_SECONDS)
+            try:
+                await self.rebuild()
+            except Exception as e:
+                logger.error(f"Revocation rebuild error: {str(e)}")
+
+    async def start(self) -> None:
+        """
+        加载吊销列表并启动订阅
+        """
+        await self.rebuild()
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._periodic_rebuild()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+revocation_list = RevocationList()
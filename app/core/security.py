@@ -1,5 +1,7 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Dict, Optional, Union
 from jose import jwt
 from passlib.context import CryptContext
 import logging
@@ -11,16 +13,24 @@ logger = logging.getLogger(__name__)
 # 配置密码上下文
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# 密码哈希专用执行器，避免 bcrypt 计算阻塞事件循环
+_hash_executor: Optional[Executor] = None
+
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any],
+    expires_delta: timedelta = None,
+    claims: Optional[Dict[str, Any]] = None,
 ) -> str:
+    """
+    创建访问令牌，claims 为额外写入的声明（角色、状态、令牌版本等）
+    """
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
-    to_encode = {"exp": expire, "sub": str(subject)}
+    to_encode = {**(claims or {}), "exp": expire, "sub": str(subject), "type": "access"}
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
@@ -63,4 +73,46 @@ def get_password_hash(password: str) -> str:
         
     except Exception as e:
         logger.error(f"密码哈希生成失败 - 错误: {str(e)}")
-        raise 
\ No newline at end of file
+        raise 
+
+def get_hash_executor() -> Executor:
+    """
+    获取密码哈希执行器（按配置创建线程池或进程池）
+    """
+    global _hash_executor
+    if _hash_executor is None:
+        if settings.PASSWORD_HASH_EXECUTOR == "process":
+            _hash_executor = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS
+            )
+        else:
+            _hash_executor = ThreadPoolExecutor(
+                max_workers=settings.PASSWORD_HASH_WORKERS,
+                thread_name_prefix="password-hash",
+            )
+    return _hash_executor
+
+def shutdown_hash_executor() -> None:
+    """
+    关闭密码哈希执行器
+    """
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False)
+        _hash_executor = None
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    在哈希执行器中验证密码
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_hash_executor(), verify_password, plain_password, hashed_password
+    )
+
+async def get_password_hash_async(password: str) -> str:
+    """
+    在哈希执行器中生成密码哈希
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_hash_executor(), get_password_hash, password)
@@ -0,0 +1,121 @@
+import json
+import logging
+import secrets
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from app.core import security
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import redis
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# 令牌版本号进程内缓存，避免每个请求都访问 Redis
+_version_cache = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.TOKEN_VERSION_LOCAL_TTL_SECONDS,
+)
+
+# 最近一次从 Redis 读到的版本号，Redis 不可用时使用；保留到该版本签发的访问令牌全部过期
+_last_known_versions = TTLCache(
+    maxsize=settings.PRINCIPAL_CACHE_MAX_SIZE,
+    ttl=settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+)
+
+
+def _version_key(user_id: int) -> str:
+    return f"token_version:{user_id}"
+
+
+def _refresh_key(token: str) -> str:
+    return f"refresh_token:{token}"
+
+
+async def get_token_version(user_id: int) -> int:
+    """
+    获取用户当前的令牌版本号
+
+    Redis 不可用时退回最近一次读到的版本号，没有记录时抛出原异常
+    """
+    version = _version_cache.get(user_id)
+    if version is None:
+        try:
+            version = int(await redis.get(_version_key(user_id)) or 0)
+        except Exception as e:
+            version = _last_known_versions.get(user_id)
+            if version is None:
+                raise
+            logger.warning(f"Token version read error, using last known version: {str(e)}")
+            return version
+        _version_cache.set(user_id, version)
+        _last_known_versions.set(user_id, version)
+    return version
+
+
+async def bump_token_version(user_id: int) -> int:
+    """
+    递增令牌版本号，使该用户已签发的全部令牌失效
+    """
+    version = int(await redis.incr(_version_key(user_id)))
+    _version_cache.pop(user_id)
+    _last_known_versions.pop(user_id)
+    return version
+
+
+async def create_refresh_token(user_id: int, version: int) -> str:
+    """
+    创建刷新令牌并保存到 Redis
+    """
+    token = secrets.token_urlsafe(32)
+    await redis.set(
+        _refresh_key(token),
+        json.dumps({"user_id": user_id, "ver": version}),
+        ex=timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    return token
+
+
+async def consume_refresh_token(token: str) -> Optional[Dict[str, Any]]:
+    """
+    取出并删除刷新令牌（一次性使用），不存在时返回 None
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.get(_refresh_key(token))
+        pipe.delete(_refresh_key(token))
+        raw, _ = await pipe.execute()
+    return json.loads(raw) if raw else None
+
+
+async def revoke_refresh_token(token: str) -> None:
+    """
+    删除刷新令牌
+    """
+    await redis.delete(_refresh_key(token))
+
+
+async def issue_tokens(user: User) -> Dict[str, str]:
+    """
+    为用户签发访问令牌和刷新令牌
+
+    访问令牌携带角色、状态和令牌版本声明，权限判断无需查询数据库
+    """
+    version = await get_token_version(user.id)
+    access_token = security.create_access_token(
+        user.id,
+        expires_delta=timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES),
+        claims={
+            "role": user.role,
+            "status": bool(user.status),
+            "ver": version,
+            "jti": uuid.uuid4().hex,
+        },
+    )
+    refresh_token = await create_refresh_token(user.id, version)
+    return {
+        "access_token": access_token,
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+    }
@@ -4,7 +4,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.crud.base import CRUDBase
 from app.models.order import Order, OrderItem, OrderLog
 from app.schemas.order import OrderCreate, OrderUpdate, OrderItemCreate, OrderLogCreate
-import uuid
 
 
 class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
@@ -29,38 +28,6 @@ class CRUDOrder(CRUDBase[Order, OrderCreate, OrderUpdate]):
         )
         return result.scalars().all()
 
-    async def create_with_items(
-        self, db: AsyncSession, *, obj_in: OrderCreate, user_id: int
-    ) -> Order:
-        """
-        创建订单及其订单项
-        """
-        # 生成订单号
-        order_no = f"ORDER{uuid.uuid4().hex[:8].upper()}"
-        
-        # 创建订单
-        order_data = obj_in.dict(exclude={"items"})
-        order_data["order_no"] = order_no
-        order_data["user_id"] = user_id
-        db_obj = Order(**order_data)
-        db.add(db_obj)
-        await db.flush()
-        
-        # 创建订单项
-        total_amount = 0
-        for item in obj_in.items:
-            item_data = item.dict()
-            item_data["order_id"] = db_obj.id
-            db_item = OrderItem(**item_data)
-            db.add(db_item)
-            total_amount += item_data["price"] * item_data["quantity"]
-        
-        # 更新订单总金额
-        db_obj.total_amount = total_amount
-        await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
-
 
 class CRUDOrderItem(CRUDBase[OrderItem, OrderItemCreate, OrderItemCreate]):
     async def get_by_order(
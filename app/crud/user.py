@@ -3,12 +3,19 @@ from typing import Any, Dict, Optional, Union
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
-from app.core.security import get_password_hash, verify_password
+from app.core.cache import principal_cache
+from app.core.counters import daily_counters
+from app.core.security import get_password_hash_async, verify_password_async
+from app.core.tokens import bump_token_version
 from app.crud.base import CRUDBase
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
 
+# 变更后需要让已签发令牌失效的字段
+TOKEN_SENSITIVE_FIELDS = ("role", "status", "is_active", "is_superuser", "hashed_password")
+
+
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     async def get(self, db: AsyncSession, id: int) -> Optional[User]:
         result = await db.execute(select(User).filter(User.id == id))
@@ -26,7 +33,7 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         user = await self.get_by_username(db, username=username)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
         return user
 
@@ -36,17 +43,21 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     async def is_superuser(self, user: User) -> bool:
         return user.role == "admin"
 
+    async def is_admin(self, user: User) -> bool:
+        return user.role == "admin"
+
     async def create(self, db: AsyncSession, *, obj_in: Union[UserCreate, Dict[str, Any]]) -> User:
         if isinstance(obj_in, dict):
             create_data = obj_in
         else:
             create_data = obj_in.dict(exclude_unset=True)
-        create_data["hashed_password"] = get_password_hash(create_data["password"])
+        create_data["hashed_password"] = await get_password_hash_async(create_data["password"])
         del create_data["password"]
         db_obj = User(**create_data)
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        await daily_counters.incr(db_obj.created_at, user_count=1)
         return db_obj
 
     async def update(
@@ -57,20 +68,29 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         else:
             update_data = obj_in.dict(exclude_unset=True)
         if update_data.get("password"):
-            hashed_password = get_password_hash(update_data["password"])
+            hashed_password = await get_password_hash_async(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
+        revoke_tokens = any(
+            field in update_data and update_data[field] != getattr(db_obj, field)
+            for field in TOKEN_SENSITIVE_FIELDS
+        )
         for field in update_data:
             setattr(db_obj, field, update_data[field])
         db.add(db_obj)
         await db.commit()
         await db.refresh(db_obj)
+        if revoke_tokens:
+            await bump_token_version(db_obj.id)
+        await principal_cache.invalidate(db_obj.id)
         return db_obj
 
     async def remove(self, db: AsyncSession, *, id: int) -> User:
         obj = await db.get(User, id)
         await db.delete(obj)
         await db.commit()
+        await bump_token_version(id)
+        await principal_cache.invalidate(id)
         return obj
 
 
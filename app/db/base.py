@@ -21,5 +21,11 @@ from app.models.after_sale import (  # noqa
 from app.models.statistics import (  # noqa
     Statistics,
     SalesTrend,
-    ProductRanking
-) 
\ No newline at end of file
+    ProductRanking,
+    SalesRollup,
+    GeoSalesDaily,
+    RefundDaily,
+    CategorySalesDaily
+)
+from app.models.idempotency import IdempotencyKey  # noqa
+from app.models.inventory import InventorySyncBatch  # noqa
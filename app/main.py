@@ -5,6 +5,11 @@ from app.api.v1.api import api_router
 from app.core.config import settings
 from app.db.session import engine
 from app.core.redis import redis
+from app.core.cache import principal_cache
+from app.core.events import dashboard_events
+from app.core.order_no import order_no_generator
+from app.core.revocation import revocation_list
+from app.core.security import shutdown_hash_executor
 from app.db.base import Base
 from sqlalchemy import text
 import logging
@@ -74,6 +79,18 @@ async def startup():
         # 测试 Redis 连接
         await redis.ping()
         logger.info("Redis连接测试成功")
+        
+        # 加载令牌吊销列表并订阅更新
+        await revocation_list.start()
+
+        # 订阅当前用户缓存的失效广播
+        await principal_cache.start()
+
+        # 订阅仪表盘实时事件
+        await dashboard_events.start()
+
+        # 租用订单号 worker id
+        await order_no_generator.start()
     except Exception as e:
         logger.error(f"Startup error: {str(e)}")
         raise
@@ -84,8 +101,13 @@ async def shutdown():
     应用关闭时的清理操作
     """
     try:
+        await order_no_generator.stop()
+        await dashboard_events.stop()
+        await principal_cache.stop()
+        await revocation_list.stop()
         await redis.close()
         await engine.dispose()
+        shutdown_hash_executor()
         logger.info("Application shutdown successful")
     except Exception as e:
         logger.error(f"Shutdown error: {str(e)}")
@@ -2,4 +2,6 @@ from app.models.user import User
 from app.models.product import Product, Category, ProductImage, ProductSKU
 from app.models.order import Order, OrderItem, OrderLog
 from app.models.after_sale import AfterSale, AfterSaleItem, AfterSaleLog
-from app.models.statistics import Statistics 
\ No newline at end of file
+from app.models.statistics import Statistics
+from app.models.idempotency import IdempotencyKey
+from app.models.inventory import InventorySyncBatch 
\ No newline at end of file
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Integer, UniqueConstraint
+from app.db.base_class import Base, TimestampMixin
+
+
+class IdempotencyKey(Base, TimestampMixin):
+    """幂等键表，与创建的业务数据在同一事务中写入"""
+    __tablename__ = "idempotency_keys"
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键ID")
+    scope = Column(String(50), nullable=False, comment="接口范围")
+    owner_id = Column(Integer, nullable=False, comment="用户ID")
+    key = Column(String(128), nullable=False, comment="Idempotency-Key")
+    fingerprint = Column(String(64), nullable=False, comment="请求体摘要")
+    resource_id = Column(Integer, nullable=False, comment="创建的资源ID")
+
+    __table_args__ = (
+        UniqueConstraint("scope", "owner_id", "key", name="uq_idempotency_keys_scope_owner_key"),
+    )
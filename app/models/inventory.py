@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Integer, JSON
+from app.db.base_class import Base, TimestampMixin
+
+
+class InventorySyncBatch(Base, TimestampMixin):
+    """热点 SKU 销量同步批次表，与库存扣减在同一事务中写入"""
+    __tablename__ = "inventory_sync_batches"
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键ID")
+    batch_id = Column(String(32), unique=True, index=True, nullable=False, comment="批次标识")
+    items = Column(JSON, comment="各 SKU 同步的销量")
@@ -72,6 +72,7 @@ class ProductSKU(Base, TimestampMixin):
     sales = Column(Integer, default=0, comment="SKU销量")
     attributes = Column(JSON, comment="SKU属性，如颜色、尺寸等")
     is_active = Column(Boolean, default=True, comment="是否启用")
+    is_hot = Column(Boolean, default=False, nullable=False, comment="是否热点SKU，热点期间库存由 Redis 维护")
     
     # 关联
     product = relationship("Product", back_populates="skus") 
\ No newline at end of file
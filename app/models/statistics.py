@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Float, DateTime, JSON
+from sqlalchemy import Column, String, Integer, Float, DateTime, JSON, UniqueConstraint
 from app.db.base_class import Base, TimestampMixin
 
 class Statistics(Base, TimestampMixin):
@@ -14,7 +14,7 @@ class Statistics(Base, TimestampMixin):
     total_refunds = Column(Integer, default=0, comment="总退款数")
     total_refund_amount = Column(Float, default=0, comment="总退款金额")
     avg_order_amount = Column(Float, default=0, comment="平均订单金额")
-    conversion_rate = Column(Float, default=0, comment="转化率")
+    conversion_rate = Column(Float, nullable=True, comment="转化率")
     extra = Column(JSON, comment="额外统计信息")
 
 class SalesTrend(Base, TimestampMixin):
@@ -44,4 +44,69 @@ class ProductRanking(Base, TimestampMixin):
     favorite_count = Column(Integer, default=0, comment="收藏量")
     cart_count = Column(Integer, default=0, comment="加购量")
     ranking = Column(Integer, default=0, comment="排名")
-    extra = Column(JSON, comment="额外排行信息") 
\ No newline at end of file
+    extra = Column(JSON, comment="额外排行信息") 
+
+class SalesRollup(Base, TimestampMixin):
+    """销售汇总表（按小时、天、周、月汇总）"""
+    __tablename__ = "sales_rollups"
+    __table_args__ = (
+        UniqueConstraint("resolution", "bucket", name="uq_sales_rollups_resolution_bucket"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键ID")
+    resolution = Column(String(10), nullable=False, comment="粒度：hour、day、week、month")
+    bucket = Column(DateTime, nullable=False, comment="时间段开始时间")
+    sales_amount = Column(Float, default=0, comment="销售额")
+    order_count = Column(Integer, default=0, comment="订单数")
+    user_count = Column(Integer, default=0, comment="用户数")
+    refund_count = Column(Integer, default=0, comment="退款数")
+    refund_amount = Column(Float, default=0, comment="退款金额")
+
+class GeoSalesDaily(Base, TimestampMixin):
+    """地区销售日汇总表（按收货省份、城市）"""
+    __tablename__ = "geo_sales_daily"
+    __table_args__ = (
+        UniqueConstraint("date", "province", "city", name="uq_geo_sales_daily_date_province_city"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键ID")
+    date = Column(DateTime, nullable=False, comment="统计日期")
+    province = Column(String(50), nullable=False, comment="省份")
+    city = Column(String(50), nullable=False, comment="城市")
+    order_count = Column(Integer, default=0, comment="订单数")
+    paid_order_count = Column(Integer, default=0, comment="已支付订单数")
+    sales_amount = Column(Float, default=0, comment="销售额")
+
+class RefundDaily(Base, TimestampMixin):
+    """售后日汇总表（按售后类型、原因、商品）"""
+    __tablename__ = "refund_daily"
+    __table_args__ = (
+        UniqueConstraint("date", "type", "reason", "product_id", name="uq_refund_daily_date_type_reason_product"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键ID")
+    date = Column(DateTime, nullable=False, comment="统计日期")
+    type = Column(String(20), nullable=False, comment="售后类型")
+    reason = Column(String(200), nullable=False, comment="售后原因")
+    product_id = Column(Integer, nullable=False, index=True, comment="商品ID")
+    applied_count = Column(Integer, default=0, comment="当天申请数")
+    completed_count = Column(Integer, default=0, comment="当天完成数")
+    refund_amount = Column(Float, default=0, comment="当天完成的退款金额")
+    total_duration_seconds = Column(Integer, default=0, comment="当天完成售后的处理总时长（秒）")
+    max_duration_seconds = Column(Integer, default=0, comment="当天完成售后的最长处理时长（秒）")
+
+class CategorySalesDaily(Base, TimestampMixin):
+    """分类销售日汇总表，包含子分类汇总到祖先分类的数据"""
+    __tablename__ = "category_sales_daily"
+    __table_args__ = (
+        UniqueConstraint("date", "category_id", name="uq_category_sales_daily_date_category"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True, comment="主键ID")
+    date = Column(DateTime, nullable=False, comment="统计日期")
+    category_id = Column(Integer, nullable=False, index=True, comment="分类ID")
+    parent_id = Column(Integer, index=True, comment="父分类ID（统计时）")
+    sales_amount = Column(Float, default=0, comment="销售额（含子分类）")
+    sales_count = Column(Integer, default=0, comment="销量（含子分类）")
+    direct_sales_amount = Column(Float, default=0, comment="直属商品销售额")
+    direct_sales_count = Column(Integer, default=0, comment="直属商品销量")
@@ -1,4 +1,4 @@
-from .token import Token, TokenPayload
+from .token import Token, TokenPayload, RefreshTokenRequest
 from .user import User, UserCreate, UserInDB, UserUpdate, UserList
 from .product import (
     Product,
@@ -21,15 +21,18 @@ from .product import (
     ProductSKUUpdate,
     ProductSKUInDB,
     ProductSKUList,
+    HotSKU,
 )
 from .order import (
     Order,
     OrderCreate,
+    OrderRequest,
     OrderUpdate,
     OrderInDB,
     OrderList,
     OrderItem,
     OrderItemCreate,
+    OrderItemRequest,
     OrderItemUpdate,
     OrderItemInDB,
     OrderItemList,
@@ -66,6 +69,16 @@ from .statistics import (
     SalesTrendUpdate,
     SalesTrendInDB,
     SalesTrendList,
+    SalesTrendSeries,
+    SalesRollup,
+    SalesRollupList,
+    GeoSales,
+    GeoSalesList,
+    RefundStats,
+    RefundStatsList,
+    CategorySales,
+    CategorySalesList,
+    CohortReport,
     ProductRanking,
     ProductRankingCreate,
     ProductRankingUpdate,
@@ -78,6 +91,7 @@ from .msg import Msg
 __all__ = [
     "Token",
     "TokenPayload",
+    "RefreshTokenRequest",
     "User",
     "UserCreate",
     "UserInDB",
@@ -103,13 +117,16 @@ __all__ = [
     "ProductSKUUpdate",
     "ProductSKUInDB",
     "ProductSKUList",
+    "HotSKU",
     "Order",
     "OrderCreate",
+    "OrderRequest",
     "OrderUpdate",
     "OrderInDB",
     "OrderList",
     "OrderItem",
     "OrderItemCreate",
+    "OrderItemRequest",
     "OrderItemUpdate",
     "OrderItemInDB",
     "OrderItemList",
@@ -142,6 +159,16 @@ __all__ = [
     "SalesTrendUpdate",
     "SalesTrendInDB",
     "SalesTrendList",
+    "SalesTrendSeries",
+    "SalesRollup",
+    "SalesRollupList",
+    "GeoSales",
+    "GeoSalesList",
+    "RefundStats",
+    "RefundStatsList",
+    "CategorySales",
+    "CategorySalesList",
+    "CohortReport",
     "ProductRanking",
     "ProductRankingCreate",
     "ProductRankingUpdate",
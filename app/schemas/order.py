@@ -20,14 +20,19 @@ class OrderItemUpdate(BaseModel):
     total_price: Optional[float] = None
     extra: Optional[Dict[str, Any]] = None
 
-class OrderItemInDB(OrderItemBase):
+class OrderItemInDB(BaseModel):
     id: int
     order_id: int
+    product_id: int
+    product_sku_id: int
     product_name: str
-    product_image: Optional[str]
-    sku_code: Optional[str]
-    sku_attributes: Optional[dict]
+    product_sku_name: str
+    product_image: Optional[str] = None
+    sku_attributes: Optional[dict] = None
+    quantity: int
+    price: float
     total_amount: float
+    total_price: float
     created_at: datetime
     updated_at: datetime
 
@@ -61,6 +66,22 @@ class OrderBase(BaseModel):
 class OrderCreate(OrderBase):
     items: List[OrderItemCreate]
 
+# 下单请求：只包含客户端可以提供的字段，订单号、金额、状态等由服务端生成
+class OrderItemRequest(BaseModel):
+    product_id: int
+    sku_id: int
+    quantity: int = Field(..., gt=0)
+
+class OrderRequest(BaseModel):
+    receiver_name: str
+    receiver_phone: str
+    receiver_province: str
+    receiver_city: str
+    receiver_district: str
+    receiver_address: str
+    remark: Optional[str] = None
+    items: List[OrderItemRequest] = Field(..., min_length=1)
+
 class OrderUpdate(BaseModel):
     status: Optional[str] = None
     payment_method: Optional[str] = None
@@ -72,6 +72,7 @@ class ProductSKUUpdate(ProductSKUBase):
 class ProductSKUInDB(ProductSKUBase):
     id: int
     product_id: int
+    is_hot: bool = False
     created_at: datetime
     updated_at: datetime
 
@@ -81,6 +82,10 @@ class ProductSKUInDB(ProductSKUBase):
 class ProductSKU(ProductSKUInDB):
     pass
 
+class HotSKU(BaseModel):
+    sku_id: int
+    stock: int
+
 # Product schemas
 class ProductBase(BaseModel):
     name: str
@@ -13,7 +13,7 @@ class StatisticsBase(BaseModel):
     total_refunds: int = 0
     total_refund_amount: float = 0
     avg_order_amount: float = 0
-    conversion_rate: float = 0
+    conversion_rate: Optional[float] = None
     extra: Optional[Dict[str, Any]] = None
 
 class StatisticsCreate(StatisticsBase):
@@ -84,6 +84,19 @@ class SalesTrend(SalesTrendInDB):
     """销售趋势 schema"""
     pass
 
+# SalesRollup schemas
+class SalesRollup(BaseModel):
+    """销售汇总 schema"""
+    bucket: datetime
+    sales_amount: float = 0
+    order_count: int = 0
+    user_count: int = 0
+    refund_count: int = 0
+    refund_amount: float = 0
+
+    class Config:
+        from_attributes = True
+
 # ProductRanking schemas
 class ProductRankingBase(BaseModel):
     """商品排行基础 schema"""
@@ -140,6 +153,76 @@ class ProductRankingList(BaseModel):
     total: int
     items: List[ProductRanking]
 
+class GeoSales(BaseModel):
+    """地区销售 schema，按省份汇总时 city 为空"""
+    province: str
+    city: Optional[str] = None
+    order_count: int = 0
+    paid_order_count: int = 0
+    sales_amount: float = 0
+
+class GeoSalesList(BaseModel):
+    """地区销售列表响应 schema"""
+    items: List[GeoSales]
+
+class RefundStats(BaseModel):
+    """售后统计 schema，未参与分组的维度为空"""
+    type: Optional[str] = None
+    reason: Optional[str] = None
+    product_id: Optional[int] = None
+    applied_count: int = 0
+    completed_count: int = 0
+    refund_amount: float = 0
+    avg_duration_hours: float = 0
+    max_duration_hours: float = 0
+
+class RefundStatsList(BaseModel):
+    """售后统计列表响应 schema"""
+    items: List[RefundStats]
+
+class CategorySales(BaseModel):
+    """分类销售 schema"""
+    date: datetime
+    category_id: int
+    parent_id: Optional[int] = None
+    sales_amount: float = 0
+    sales_count: int = 0
+    direct_sales_amount: float = 0
+    direct_sales_count: int = 0
+
+    class Config:
+        from_attributes = True
+
+class CategorySalesList(BaseModel):
+    """分类销售列表响应 schema"""
+    items: List[CategorySales]
+
+class CohortReport(BaseModel):
+    """同期群留存报表 schema（按首单月份分组）"""
+    start_date: datetime
+    end_date: datetime
+    generated_at: datetime
+    cohorts: List[str]  # 首单月份，如 2024-03
+    cohort_sizes: List[int]
+    retention: List[List[int]]  # 首单后第 N 个月仍下单的用户数
+    revenue: List[List[float]]  # 首单后第 N 个月的销售额
+    repeat_rates: Dict[str, List[float]]  # 首单后 N 天内复购的用户占比
+
+class SalesTrendSeries(BaseModel):
+    """销售趋势序列响应 schema（按列存储，空时间段补零）"""
+    resolution: str
+    buckets: List[datetime]
+    sales_amount: List[float]
+    order_count: List[int]
+    user_count: List[int]
+    refund_count: List[int]
+    refund_amount: List[float]
+
+class SalesRollupList(BaseModel):
+    """销售汇总列表响应 schema"""
+    resolution: str
+    items: List[SalesRollup]
+
 class DashboardStats(BaseModel):
     """仪表盘统计数据模型"""
     today_sales: float  # 今日销售额
@@ -154,6 +237,6 @@ class DashboardStats(BaseModel):
     total_refunds: int  # 总退款数
     total_refund_amount: float  # 总退款金额
     avg_order_amount: float  # 平均订单金额
-    conversion_rate: float  # 转化率
+    conversion_rate: Optional[float] = None  # 转化率（无浏览量数据时为空）
     sales_trend: List[SalesTrend]  # 销售趋势
     product_rankings: List[ProductRanking]  # 商品排行 
\ No newline at end of file
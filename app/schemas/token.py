@@ -5,8 +5,18 @@ class Token(BaseModel):
     """Token schema"""
     access_token: str
     token_type: str = "bearer"
+    refresh_token: Optional[str] = None
 
 class TokenPayload(BaseModel):
     """Token payload schema"""
     sub: Optional[int] = None  # subject (user id)
-    exp: Optional[int] = None  # expiration time 
\ No newline at end of file
+    exp: Optional[int] = None  # expiration time
+    type: Optional[str] = None  # token type
+    role: Optional[str] = None  # user role
+    status: Optional[bool] = None  # user status
+    ver: int = 0  # token version
+    jti: Optional[str] = None  # token id, used for revocation
+
+class RefreshTokenRequest(BaseModel):
+    """Refresh token request schema"""
+    refresh_token: str 
\ No newline at end of file
@@ -1,7 +1,11 @@
-from typing import List, Optional, Dict, Any
+from typing import Any, List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
-from app.models.after_sale import AfterSale, AfterSaleLog
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from app.core.counters import daily_counters
+from app.core.idempotency import IdempotentRequest
+from app.models.after_sale import AfterSale, AfterSaleItem, AfterSaleLog
 from app.models.order import Order, OrderItem
 from app.schemas.after_sale import (
     AfterSaleCreate,
@@ -9,116 +13,200 @@ from app.schemas.after_sale import (
     AfterSaleLogCreate,
 )
 
-def get_after_sale(db: Session, after_sale_id: int) -> Optional[AfterSale]:
-    return db.query(AfterSale).filter(AfterSale.id == after_sale_id).first()
-
-def get_after_sales(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
-    user_id: Optional[int] = None,
-    order_id: Optional[int] = None,
-    status: Optional[str] = None,
-    type: Optional[str] = None,
-) -> List[AfterSale]:
-    query = db.query(AfterSale)
-    if user_id is not None:
-        query = query.filter(AfterSale.user_id == user_id)
-    if order_id is not None:
-        query = query.filter(AfterSale.order_id == order_id)
-    if status is not None:
-        query = query.filter(AfterSale.status == status)
-    if type is not None:
-        query = query.filter(AfterSale.type == type)
-    return query.offset(skip).limit(limit).all()
-
-def create_after_sale(db: Session, after_sale_in: AfterSaleCreate, user_id: int) -> AfterSale:
-    # 检查订单和订单项是否存在
-    order = db.query(Order).filter(Order.id == after_sale_in.order_id).first()
-    order_item = db.query(OrderItem).filter(OrderItem.id == after_sale_in.order_item_id).first()
-    if not order or not order_item:
-        raise ValueError("订单或订单项不存在")
-    
-    # 检查是否已经存在售后申请
-    existing = db.query(AfterSale).filter(
-        AfterSale.order_item_id == after_sale_in.order_item_id,
-        AfterSale.status.in_(['pending', 'approved', 'processing'])
-    ).first()
-    if existing:
-        raise ValueError("该订单项已存在进行中的售后申请")
-    
-    # 创建售后申请
-    db_after_sale = AfterSale(
-        order_id=after_sale_in.order_id,
-        order_item_id=after_sale_in.order_item_id,
-        user_id=user_id,
-        type=after_sale_in.type,
-        reason=after_sale_in.reason,
-        description=after_sale_in.description,
-    )
-    db.add(db_after_sale)
-    
-    # 创建售后日志
-    db_log = AfterSaleLog(
-        after_sale_id=db_after_sale.id,
-        action="create",
-        operator=f"user_{user_id}",
-        remark="创建售后申请",
-    )
-    db.add(db_log)
-    
-    db.commit()
-    db.refresh(db_after_sale)
-    return db_after_sale
-
-def update_after_sale(
-    db: Session, after_sale_id: int, after_sale_in: AfterSaleUpdate, operator: str
-) -> Optional[AfterSale]:
-    db_after_sale = get_after_sale(db, after_sale_id)
-    if not db_after_sale:
-        return None
-    
-    update_data = after_sale_in.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_after_sale, field, value)
-    
-    # 创建售后日志
-    db_log = AfterSaleLog(
-        after_sale_id=after_sale_id,
-        action="update",
-        operator=operator,
-        remark=f"更新售后状态为{after_sale_in.status}" if after_sale_in.status else "更新售后信息",
-        extra=update_data,
-    )
-    db.add(db_log)
-    
-    db.add(db_after_sale)
-    db.commit()
-    db.refresh(db_after_sale)
-    return db_after_sale
-
-def get_after_sale_logs(
-    db: Session, after_sale_id: int, skip: int = 0, limit: int = 100
-) -> List[AfterSaleLog]:
-    return (
-        db.query(AfterSaleLog)
-        .filter(AfterSaleLog.after_sale_id == after_sale_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-def create_after_sale_log(
-    db: Session, after_sale_id: int, log_in: AfterSaleLogCreate
-) -> AfterSaleLog:
-    db_log = AfterSaleLog(
-        after_sale_id=after_sale_id,
-        action=log_in.action,
-        operator=log_in.operator,
-        remark=log_in.remark,
-        extra=log_in.extra,
-    )
-    db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
-    return db_log 
\ No newline at end of file
+
+class AfterSaleService:
+    @staticmethod
+    async def get_after_sale(db: AsyncSession, after_sale_id: int) -> Optional[AfterSale]:
+        """
+        获取售后申请详情
+        """
+        result = await db.execute(
+            select(AfterSale)
+            .options(selectinload(AfterSale.items))
+            .filter(AfterSale.id == after_sale_id)
+        )
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    def _filtered(
+        query,
+        user_id: Optional[int] = None,
+        order_id: Optional[int] = None,
+        status: Optional[str] = None,
+        type: Optional[str] = None,
+    ):
+        if user_id is not None:
+            query = query.filter(AfterSale.user_id == user_id)
+        if order_id is not None:
+            query = query.filter(AfterSale.order_id == order_id)
+        if status is not None:
+            query = query.filter(AfterSale.status == status)
+        if type is not None:
+            query = query.filter(AfterSale.type == type)
+        return query
+
+    @staticmethod
+    async def get_after_sales(
+        db: AsyncSession,
+        skip: int = 0,
+        limit: int = 100,
+        **filters: Any,
+    ) -> List[AfterSale]:
+        """
+        获取售后申请列表
+        """
+        query = AfterSaleService._filtered(
+            select(AfterSale).options(selectinload(AfterSale.items)), **filters
+        )
+        result = await db.execute(query.offset(skip).limit(limit))
+        return result.scalars().all()
+
+    @staticmethod
+    async def count_after_sales(db: AsyncSession, **filters: Any) -> int:
+        """
+        统计售后申请数量
+        """
+        query = AfterSaleService._filtered(select(func.count(AfterSale.id)), **filters)
+        result = await db.execute(query)
+        return result.scalar() or 0
+
+    @staticmethod
+    async def create_after_sale(
+        db: AsyncSession,
+        after_sale_in: AfterSaleCreate,
+        user_id: int,
+        idempotency: Optional[IdempotentRequest] = None,
+    ) -> AfterSale:
+        """
+        创建售后申请
+        """
+        # 检查订单和订单项是否存在
+        order = await db.get(Order, after_sale_in.order_id)
+        order_item = await db.get(OrderItem, after_sale_in.order_item_id)
+        if not order or not order_item:
+            raise ValueError("订单或订单项不存在")
+
+        # 检查是否已经存在售后申请
+        existing = await db.execute(
+            select(AfterSale.id).filter(
+                AfterSale.order_item_id == after_sale_in.order_item_id,
+                AfterSale.status.in_(['pending', 'approved', 'processing'])
+            ).limit(1)
+        )
+        if existing.first():
+            raise ValueError("该订单项已存在进行中的售后申请")
+
+        # 创建售后申请
+        db_after_sale = AfterSale(
+            order_id=after_sale_in.order_id,
+            order_item_id=after_sale_in.order_item_id,
+            user_id=user_id,
+            type=after_sale_in.type,
+            reason=after_sale_in.reason,
+            description=after_sale_in.description,
+            items=[AfterSaleItem(**item.dict()) for item in after_sale_in.items],
+        )
+        db.add(db_after_sale)
+        await db.flush()
+
+        # 创建售后日志
+        db.add(AfterSaleLog(
+            after_sale_id=db_after_sale.id,
+            action="create",
+            operator=f"user_{user_id}",
+            remark="创建售后申请",
+        ))
+        if idempotency:
+            idempotency.record(db, db_after_sale.id)
+
+        # 会话提交后不过期，且已加载 items，不再 refresh 以免触发延迟加载
+        await db.commit()
+        return db_after_sale
+
+    @staticmethod
+    async def update_after_sale(
+        db: AsyncSession, after_sale_id: int, after_sale_in: AfterSaleUpdate, operator: str
+    ) -> Optional[AfterSale]:
+        """
+        更新售后申请
+        """
+        db_after_sale = await AfterSaleService.get_after_sale(db, after_sale_id)
+        if not db_after_sale:
+            return None
+
+        was_completed = db_after_sale.status == 'completed'
+        update_data = after_sale_in.dict(exclude_unset=True)
+        for field, value in update_data.items():
+            setattr(db_after_sale, field, value)
+        completed = db_after_sale.status == 'completed' and not was_completed
+        if completed:
+            db_after_sale.complete_time = datetime.utcnow()
+
+        # 创建售后日志
+        db.add(AfterSaleLog(
+            after_sale_id=after_sale_id,
+            action="update",
+            operator=operator,
+            remark=f"更新售后状态为{after_sale_in.status}" if after_sale_in.status else "更新售后信息",
+            extra=update_data,
+        ))
+
+        await db.commit()
+
+        # 售后完成时更新当日实时计数
+        if completed:
+            await daily_counters.incr(
+                db_after_sale.complete_time,
+                refund_count=1,
+                refund_amount=db_after_sale.refund_amount or 0,
+            )
+        return db_after_sale
+
+    @staticmethod
+    async def get_after_sale_logs(
+        db: AsyncSession, after_sale_id: int, skip: int = 0, limit: int = 100
+    ) -> List[AfterSaleLog]:
+        """
+        获取售后日志列表
+        """
+        result = await db.execute(
+            select(AfterSaleLog)
+            .filter(AfterSaleLog.after_sale_id == after_sale_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def count_after_sale_logs(db: AsyncSession, after_sale_id: int) -> int:
+        """
+        统计售后日志数量
+        """
+        result = await db.execute(
+            select(func.count(AfterSaleLog.id)).filter(
+                AfterSaleLog.after_sale_id == after_sale_id
+            )
+        )
+        return result.scalar() or 0
+
+    @staticmethod
+    async def create_after_sale_log(
+        db: AsyncSession, after_sale_id: int, log_in: AfterSaleLogCreate
+    ) -> AfterSaleLog:
+        """
+        创建售后日志
+        """
+        db_log = AfterSaleLog(
+            after_sale_id=after_sale_id,
+            action=log_in.action,
+            operator=log_in.operator,
+            remark=log_in.remark,
+            extra=log_in.extra,
+        )
+        db.add(db_log)
+        await db.commit()
+        await db.refresh(db_log)
+        return db_log
+
+
+after_sale_service = AfterSaleService()
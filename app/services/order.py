@@ -1,202 +1,469 @@
+import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import selectinload
+from app.models.inventory import InventorySyncBatch
 from app.models.order import Order, OrderItem, OrderLog
 from app.models.product import Product, ProductSKU
 from app.models.user import User
 from app.schemas.order import (
-    OrderCreate,
+    OrderRequest,
     OrderUpdate,
     OrderItemCreate,
+    OrderItemRequest,
     OrderItemUpdate,
     OrderLogCreate,
     OrderLogUpdate,
 )
-from app import crud, models
-
-def generate_order_no() -> str:
-    """生成订单号"""
-    return datetime.now().strftime("%Y%m%d%H%M%S") + str(int(datetime.now().timestamp() * 1000))[-6:]
-
-def get_order(db: Session, order_id: int) -> Optional[Order]:
-    return db.query(Order).filter(Order.id == order_id).first()
-
-def get_order_by_no(db: Session, order_no: str) -> Optional[Order]:
-    return db.query(Order).filter(Order.order_no == order_no).first()
-
-def get_orders(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
-    user_id: Optional[int] = None,
-    status: Optional[str] = None,
-) -> List[Order]:
-    query = db.query(Order)
-    if user_id is not None:
-        query = query.filter(Order.user_id == user_id)
-    if status is not None:
-        query = query.filter(Order.status == status)
-    return query.offset(skip).limit(limit).all()
-
-def create_order(db: Session, order_in: OrderCreate, user_id: int) -> Order:
-    # 创建订单
-    order_no = generate_order_no()
-    db_order = Order(
-        order_no=order_no,
-        user_id=user_id,
-        total_amount=order_in.total_amount,
-        receiver_name=order_in.receiver_name,
-        receiver_phone=order_in.receiver_phone,
-        receiver_province=order_in.receiver_province,
-        receiver_city=order_in.receiver_city,
-        receiver_district=order_in.receiver_district,
-        receiver_address=order_in.receiver_address,
-        remark=order_in.remark,
-    )
-    db.add(db_order)
-    db.flush()  # 获取订单ID
-    
-    # 创建订单项
-    for item in order_in.items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
-        sku = db.query(ProductSKU).filter(ProductSKU.id == item.sku_id).first()
-        if not product or not sku:
-            raise ValueError("商品或SKU不存在")
-        
-        db_item = OrderItem(
-            order_id=db_order.id,
-            product_id=item.product_id,
-            sku_id=item.sku_id,
-            product_name=product.name,
-            product_image=product.main_image,
-            sku_code=sku.code,
-            sku_attributes=sku.attributes,
-            price=sku.price,
-            quantity=item.quantity,
-            total_amount=sku.price * item.quantity,
-        )
-        db.add(db_item)
-    
-    # 创建订单日志
-    db_log = OrderLog(
-        order_id=db_order.id,
-        action="create",
-        operator=f"user_{user_id}",
-        remark="创建订单",
-    )
-    db.add(db_log)
-    
-    db.commit()
-    db.refresh(db_order)
-    return db_order
-
-def update_order(
-    db: Session, order_id: int, order_in: OrderUpdate, operator: str
-) -> Optional[Order]:
-    db_order = get_order(db, order_id)
-    if not db_order:
-        return None
-    
-    update_data = order_in.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_order, field, value)
-    
-    # 创建订单日志
-    db_log = OrderLog(
-        order_id=order_id,
-        action="update",
-        operator=operator,
-        remark=f"更新订单状态为{order_in.status}" if order_in.status else "更新订单信息",
-        extra=update_data,
-    )
-    db.add(db_log)
-    
-    db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
-    return db_order
-
-def get_order_logs(
-    db: Session, order_id: int, skip: int = 0, limit: int = 100
-) -> List[OrderLog]:
-    return (
-        db.query(OrderLog)
-        .filter(OrderLog.order_id == order_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-def create_order_log(
-    db: Session, order_id: int, log_in: OrderLogCreate
-) -> OrderLog:
-    db_log = OrderLog(
-        order_id=order_id,
-        action=log_in.action,
-        operator=log_in.operator,
-        remark=log_in.remark,
-        extra=log_in.extra,
-    )
-    db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
-    return db_log
+from app.core.counters import daily_counters
+from app.core.idempotency import IdempotentRequest
+from app.core.inventory import inventory
+from app.core.order_no import order_no_generator
+from app.core.events import dashboard_events
+from app.services.statistics import PAID_ORDER_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# 订单状态允许的流转，已取消和已退款为终态，任何状态都不能回到待支付
+ORDER_STATUS_TRANSITIONS = {
+    "pending": {"paid", "cancelled"},
+    "paid": {"shipped", "refunded"},
+    "shipped": {"completed", "refunded"},
+    "completed": {"refunded"},
+    "cancelled": set(),
+    "refunded": set(),
+}
+
+# 普通用户只能取消自己的待支付订单，且只能填写取消原因
+OWNER_UPDATE_FIELDS = {"status", "cancel_reason"}
 
 class OrderService:
+    @staticmethod
+    def _order_summary(order: Order) -> Dict[str, Any]:
+        """
+        推送给管理端的订单摘要
+        """
+        return {
+            "id": order.id,
+            "order_no": order.order_no,
+            "user_id": order.user_id,
+            "status": order.status,
+            "total_amount": order.total_amount,
+            "created_at": order.created_at.isoformat(),
+        }
+
     @staticmethod
     async def get_order(db: AsyncSession, order_id: int) -> Optional[Order]:
         """
         获取订单详情
         """
-        result = await db.execute(select(Order).filter(Order.id == order_id))
+        result = await db.execute(
+            select(Order).options(selectinload(Order.items)).filter(Order.id == order_id)
+        )
         return result.scalar_one_or_none()
 
     @staticmethod
     async def get_orders(
-        db: AsyncSession, skip: int = 0, limit: int = 100
+        db: AsyncSession, skip: int = 0, limit: int = 100, user_id: Optional[int] = None
     ) -> List[Order]:
         """
         获取订单列表
         """
-        result = await db.execute(select(Order).offset(skip).limit(limit))
+        query = select(Order).options(selectinload(Order.items))
+        if user_id is not None:
+            query = query.filter(Order.user_id == user_id)
+        result = await db.execute(query.offset(skip).limit(limit))
         return result.scalars().all()
 
     @staticmethod
-    async def create_order(db: AsyncSession, order_in: OrderCreate) -> Order:
+    async def _load_line_items(
+        db: AsyncSession, items: List[OrderItemRequest]
+    ) -> List[Dict[str, Any]]:
+        """
+        一次查询加载订单涉及的全部商品和 SKU，校验后生成订单项数据
+        """
+        product_ids = {item.product_id for item in items}
+        sku_ids = {item.sku_id for item in items}
+        products = {
+            p.id: p for p in (
+                await db.execute(select(Product).filter(Product.id.in_(product_ids)))
+            ).scalars()
+        }
+        skus = {
+            s.id: s for s in (
+                await db.execute(select(ProductSKU).filter(ProductSKU.id.in_(sku_ids)))
+            ).scalars()
+        }
+
+        rows = []
+        for item in items:
+            product = products.get(item.product_id)
+            sku = skus.get(item.sku_id)
+            if not product or not sku or sku.product_id != product.id:
+                raise ValueError("商品或SKU不存在")
+            if not product.is_active or not sku.is_active:
+                raise ValueError(f"商品已下架：{product.name}")
+            amount = sku.price * item.quantity
+            rows.append({
+                "product_id": product.id,
+                "product_sku_id": sku.id,
+                "product_name": product.name,
+                "product_sku_name": sku.name,
+                "product_image": product.main_image,
+                "sku_attributes": sku.attributes,
+                "price": sku.price,
+                "quantity": item.quantity,
+                "total_amount": amount,
+                "total_price": amount,
+            })
+        return rows
+
+    @staticmethod
+    async def _decrement_stock(db: AsyncSession, quantities: Dict[int, int]) -> None:
+        """
+        按 ID 升序逐条条件扣减非热点 SKU 的库存，库存不足时抛出 ValueError
+
+        固定的加锁顺序避免并发下单时互相死锁；UPDATE ... WHERE stock >= q 保证不超卖。
+        下单时读取的热点集合可能已过期，SKU 在此期间被设为热点（库存已载入 Redis）时
+        不再扣减数据库，同样抛出 ValueError
+        """
+        for sku_id, quantity in sorted(quantities.items()):
+            result = await db.execute(
+                update(ProductSKU)
+                .where(
+                    ProductSKU.id == sku_id,
+                    ProductSKU.is_hot.is_(False),
+                    ProductSKU.stock >= quantity,
+                )
+                .values(stock=ProductSKU.stock - quantity, sales=ProductSKU.sales + quantity)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                is_hot = (
+                    await db.execute(select(ProductSKU.is_hot).filter(ProductSKU.id == sku_id))
+                ).scalar_one_or_none()
+                if is_hot:
+                    raise ValueError("商品库存状态已变更，请重新下单")
+                raise ValueError("库存不足")
+
+    @staticmethod
+    async def _adjust_product_totals(db: AsyncSession, quantities: Dict[int, int]) -> None:
+        """
+        按 ID 升序调整商品的库存与销量汇总（quantities 为售出数量，负数表示退回）
+
+        可售库存以 SKU 为准，商品汇总不做库存校验
+        """
+        for product_id, quantity in sorted(quantities.items()):
+            await db.execute(
+                update(Product)
+                .where(Product.id == product_id)
+                .values(stock=Product.stock - quantity, sales=Product.sales + quantity)
+                .execution_options(synchronize_session=False)
+            )
+
+    @staticmethod
+    def _sum_quantities(rows: List[Dict[str, Any]], field: str) -> Dict[int, int]:
+        quantities: Dict[int, int] = {}
+        for row in rows:
+            quantities[row[field]] = quantities.get(row[field], 0) + row["quantity"]
+        return quantities
+
+    @staticmethod
+    async def _reserve_stock(db: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        """
+        条件扣减订单项对应的 SKU 库存，再调整商品汇总（先 SKU 后商品）
+        """
+        await OrderService._decrement_stock(db, OrderService._sum_quantities(rows, "product_sku_id"))
+        await OrderService._adjust_product_totals(db, OrderService._sum_quantities(rows, "product_id"))
+
+    @staticmethod
+    async def _restore_stock(db: AsyncSession, order: Order) -> None:
+        """
+        退回取消订单在数据库中扣减的库存（不提交事务）
+
+        在 Redis 中预占的热点 SKU 数量没有扣减数据库，由释放预占退回
+        """
+        hot_remaining = await inventory.reserved(order.order_no)
+        result = await db.execute(
+            select(OrderItem.product_id, OrderItem.product_sku_id, OrderItem.quantity)
+            .filter(OrderItem.order_id == order.id)
+        )
+        sku_quantities: Dict[int, int] = {}
+        product_quantities: Dict[int, int] = {}
+        for product_id, sku_id, quantity in result.all():
+            hot = min(quantity, hot_remaining.get(sku_id, 0))
+            if hot:
+                hot_remaining[sku_id] -= hot
+                quantity -= hot
+            if quantity:
+                sku_quantities[sku_id] = sku_quantities.get(sku_id, 0) + quantity
+                product_quantities[product_id] = product_quantities.get(product_id, 0) + quantity
+
+        for sku_id, quantity in sorted(sku_quantities.items()):
+            await db.execute(
+                update(ProductSKU)
+                .where(ProductSKU.id == sku_id)
+                .values(stock=ProductSKU.stock + quantity, sales=ProductSKU.sales - quantity)
+                .execution_options(synchronize_session=False)
+            )
+        await OrderService._adjust_product_totals(
+            db, {product_id: -quantity for product_id, quantity in product_quantities.items()}
+        )
+
+    @staticmethod
+    async def _settle_reservation(order_no: str, status: str) -> None:
+        """
+        订单提交后确认或释放热点 SKU 的预占
+
+        失败只记录日志，预占到期后由超时任务按订单状态重新处理
+        """
+        try:
+            if status in PAID_ORDER_STATUSES:
+                await inventory.confirm(order_no)
+            else:
+                await inventory.release(order_no)
+        except Exception as e:
+            logger.error(f"Inventory reservation settle error ({order_no}): {str(e)}")
+
+    @staticmethod
+    async def create_order(
+        db: AsyncSession,
+        obj_in: OrderRequest,
+        user_id: int,
+        idempotency: Optional[IdempotentRequest] = None,
+    ) -> Order:
         """
         创建订单
+
+        订单金额按 SKU 当前价格计算，状态固定为待支付，订单项批量插入。热点 SKU 的库存在 Redis 中预占，
+        其余库存在同一事务中条件扣减
         """
-        order = Order(**order_in.dict(exclude={"items"}))
-        db.add(order)
-        await db.flush()
+        rows = await OrderService._load_line_items(db, obj_in.items)
+        order_no = order_no_generator.generate()
 
-        # 创建订单项
-        for item_in in order_in.items:
-            item = OrderItem(**item_in.dict(), order_id=order.id)
-            db.add(item)
+        hot_skus = await inventory.hot_skus()
+        hot_rows = [row for row in rows if row["product_sku_id"] in hot_skus]
+        if hot_rows:
+            await inventory.reserve(order_no, OrderService._sum_quantities(hot_rows, "product_sku_id"))
 
-        await db.commit()
-        await db.refresh(order)
+        try:
+            await OrderService._reserve_stock(
+                db, [row for row in rows if row["product_sku_id"] not in hot_skus]
+            )
+
+            order = Order(
+                **obj_in.dict(exclude={"items"}),
+                user_id=user_id,
+                order_no=order_no,
+                status="pending",
+                total_amount=sum(row["total_amount"] for row in rows),
+            )
+            db.add(order)
+            await db.flush()
+
+            # 创建订单项
+            await db.execute(insert(OrderItem), [dict(row, order_id=order.id) for row in rows])
+            db.add(OrderLog(
+                order_id=order.id,
+                action="create",
+                operator=f"user_{user_id}",
+                remark="创建订单",
+            ))
+            if idempotency:
+                idempotency.record(db, order.id)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            if hot_rows:
+                await OrderService._settle_reservation(order_no, "cancelled")
+            raise
+
+        # 订单项由批量插入写入，重新加载订单及其订单项
+        result = await db.execute(
+            select(Order)
+            .options(selectinload(Order.items))
+            .filter(Order.id == order.id)
+            .execution_options(populate_existing=True)
+        )
+        order = result.scalar_one()
+
+        # 更新当日实时计数并推送新订单事件（新订单均为待支付，不计入销售额）
+        deltas = {"order_count": 1}
+        await daily_counters.incr(order.created_at, **deltas)
+        await dashboard_events.publish("order_created", {
+            "order": OrderService._order_summary(order),
+            "delta": deltas,
+        })
         return order
 
+    @staticmethod
+    async def release_expired_reservations(db: AsyncSession) -> int:
+        """
+        取消超时未支付的订单并退回库存，返回处理的预占数
+
+        只取消仍为待支付的订单（条件更新，避免覆盖刚刚支付的订单），数据库库存在同一
+        事务中退回；已支付的订单确认预占，订单不存在（创建失败）时直接释放
+        """
+        order_nos = await inventory.expired()
+        if not order_nos:
+            return 0
+        orders = {
+            o.order_no: o for o in (
+                await db.execute(select(Order).filter(Order.order_no.in_(order_nos)))
+            ).scalars()
+        }
+
+        settled = 0
+        for order_no in order_nos:
+            order = orders.get(order_no)
+            if order is None:
+                await OrderService._settle_reservation(order_no, "cancelled")
+                settled += 1
+                continue
+            try:
+                result = await db.execute(
+                    update(Order)
+                    .where(Order.id == order.id, Order.status == "pending")
+                    .values(
+                        status="cancelled",
+                        cancel_time=datetime.utcnow(),
+                        cancel_reason="超时未支付",
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount == 1:
+                    await OrderService._restore_stock(db, order)
+                    db.add(OrderLog(
+                        order_id=order.id,
+                        action="cancel",
+                        operator="system",
+                        remark="超时未支付，自动取消",
+                    ))
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                logger.error(f"Expired order cancel error ({order_no}): {str(e)}")
+                continue
+
+            status = (
+                await db.execute(select(Order.status).filter(Order.id == order.id))
+            ).scalar_one()
+            await OrderService._settle_reservation(order_no, status)
+            settled += 1
+        return settled
+
+    @staticmethod
+    async def sync_reserved_stock(db: AsyncSession) -> int:
+        """
+        将 Redis 中已确认的热点 SKU 销量批量扣减到数据库，返回同步的 SKU 数
+
+        批次标识与库存扣减在同一事务中写入，提交后、确认前中断的批次重试时直接确认，不会重复扣减
+        """
+        batch_id, sku_quantities = await inventory.take_pending()
+        if not sku_quantities:
+            return 0
+
+        applied = await db.execute(
+            select(InventorySyncBatch.id).filter(InventorySyncBatch.batch_id == batch_id)
+        )
+        if applied.scalar_one_or_none() is not None:
+            logger.warning(f"Inventory sync batch {batch_id} already applied, acknowledging")
+            await inventory.ack_pending()
+            return 0
+
+        product_quantities: Dict[int, int] = {}
+        result = await db.execute(
+            select(ProductSKU.id, ProductSKU.product_id)
+            .filter(ProductSKU.id.in_(sku_quantities))
+        )
+        for sku_id, product_id in result.all():
+            product_quantities[product_id] = product_quantities.get(product_id, 0) + sku_quantities[sku_id]
+
+        # 销量已在 Redis 中确认，数据库库存不足说明两边不一致：记录错误并将库存置零
+        for sku_id, quantity in sorted(sku_quantities.items()):
+            result = await db.execute(
+                update(ProductSKU)
+                .where(ProductSKU.id == sku_id, ProductSKU.stock >= quantity)
+                .values(stock=ProductSKU.stock - quantity, sales=ProductSKU.sales + quantity)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                logger.error(f"Hot SKU {sku_id} stock in database is below synced sales {quantity}")
+                await db.execute(
+                    update(ProductSKU)
+                    .where(ProductSKU.id == sku_id)
+                    .values(stock=0, sales=ProductSKU.sales + quantity)
+                    .execution_options(synchronize_session=False)
+                )
+        await OrderService._adjust_product_totals(db, product_quantities)
+        db.add(InventorySyncBatch(
+            batch_id=batch_id,
+            items={str(sku_id): quantity for sku_id, quantity in sku_quantities.items()},
+        ))
+        await db.commit()
+        await inventory.ack_pending()
+        return len(sku_quantities)
+
     @staticmethod
     async def update_order(
         db: AsyncSession, order_id: int, order_in: OrderUpdate
     ) -> Optional[Order]:
         """
         更新订单
+
+        状态变更须符合 ORDER_STATUS_TRANSITIONS，并以条件更新提交，订单状态已被其他请求
+        或超时任务修改时抛出 ValueError；待支付订单取消时在同一事务中退回库存
         """
         order = await OrderService.get_order(db, order_id)
         if not order:
             return None
 
-        for field, value in order_in.dict(exclude_unset=True).items():
-            setattr(order, field, value)
+        previous_status = order.status
+        was_paid = previous_status in PAID_ORDER_STATUSES
+        update_data = order_in.dict(exclude_unset=True)
+        status = update_data.get("status", previous_status)
 
-        await db.commit()
+        if status != previous_status and status not in ORDER_STATUS_TRANSITIONS.get(previous_status, ()):
+            raise ValueError(f"订单状态不能从 {previous_status} 变更为 {status}")
+
+        try:
+            if status != previous_status:
+                result = await db.execute(
+                    update(Order)
+                    .where(Order.id == order.id, Order.status == previous_status)
+                    .values(status=status)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    raise ValueError("订单状态已变更，请刷新后重试")
+                if previous_status == "pending" and status == "cancelled":
+                    await OrderService._restore_stock(db, order)
+            for field, value in update_data.items():
+                setattr(order, field, value)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
         await db.refresh(order)
+
+        # 支付后确认热点 SKU 的预占，取消后释放
+        if previous_status == "pending" and (status in PAID_ORDER_STATUSES or status == "cancelled"):
+            await OrderService._settle_reservation(order.order_no, status)
+
+        # 订单进入或离开已支付状态时，调整下单当天的销售额
+        deltas = {}
+        is_paid = order.status in PAID_ORDER_STATUSES
+        if is_paid != was_paid:
+            deltas["sales_amount"] = order.total_amount if is_paid else -order.total_amount
+            await daily_counters.incr(order.created_at, **deltas)
+        if order.status != previous_status:
+            await dashboard_events.publish("order_status_changed", {
+                "order": OrderService._order_summary(order),
+                "previous_status": previous_status,
+                "delta": deltas,
+            })
         return order
 
     @staticmethod
@@ -1,6 +1,8 @@
 from typing import List, Optional
+from sqlalchemy import select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, models
+from app.core.inventory import inventory
 from app.schemas.product import (
     ProductCreate, ProductUpdate,
     CategoryCreate, CategoryUpdate,
@@ -258,11 +260,13 @@ class ProductSKUService:
         obj_in: ProductSKUUpdate
     ) -> Optional[models.ProductSKU]:
         """
-        更新商品SKU
+        更新商品SKU，热点 SKU 的库存由 Redis 维护，不能直接修改
         """
         sku = await crud.product_sku.get(db=db, id=sku_id)
         if not sku:
             return None
+        if "stock" in obj_in.dict(exclude_unset=True) and sku.is_hot:
+            raise ValueError("热点SKU需先取消热点再修改库存")
         return await crud.product_sku.update(db=db, db_obj=sku, obj_in=obj_in)
 
     @staticmethod
@@ -279,6 +283,68 @@ class ProductSKUService:
             return None
         return await crud.product_sku.remove(db=db, id=sku_id)
 
+    @staticmethod
+    async def set_hot(
+        db: AsyncSession,
+        *,
+        sku_id: int
+    ) -> Optional[int]:
+        """
+        将SKU设为热点，库存载入 Redis，返回当前可售库存
+
+        锁定 SKU 行后标记热点并载入库存，与之并发的数据库扣减要么在载入前提交，
+        要么因行已标记为热点而失败，避免读到销量同步扣减前的库存或重复售卖
+        """
+        result = await db.execute(
+            select(models.ProductSKU.stock)
+            .filter(models.ProductSKU.id == sku_id)
+            .with_for_update()
+        )
+        stock = result.scalar_one_or_none()
+        if stock is None:
+            await db.rollback()
+            return None
+        try:
+            await db.execute(
+                update(models.ProductSKU)
+                .where(models.ProductSKU.id == sku_id)
+                .values(is_hot=True)
+            )
+            stock = await inventory.load(sku_id, stock)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return stock
+
+    @staticmethod
+    async def unset_hot(
+        db: AsyncSession,
+        *,
+        sku_id: int
+    ) -> Optional[models.ProductSKU]:
+        """
+        取消SKU热点，库存重新由数据库扣减
+
+        仍有未完成的预占或未同步的销量时抛出 ValueError
+        """
+        result = await db.execute(
+            select(models.ProductSKU)
+            .filter(models.ProductSKU.id == sku_id)
+            .with_for_update()
+        )
+        sku = result.scalar_one_or_none()
+        if sku is None:
+            await db.rollback()
+            return None
+        try:
+            await inventory.unload(sku_id)
+            sku.is_hot = False
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        return sku
 
 product_service = ProductService()
 category_service = CategoryService()
@@ -0,0 +1,180 @@
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.redis import redis
+from app.db.session import AsyncSessionLocal
+from app.models.order import Order
+from app.services.statistics import PAID_ORDER_STATUSES
+
+logger = logging.getLogger(__name__)
+
+# 复购率统计窗口（天）
+REPEAT_WINDOWS = (30, 60, 90)
+
+
+def cohort_report(
+    user_ids: np.ndarray,
+    created_at: np.ndarray,
+    amounts: np.ndarray,
+    windows: Sequence[int] = REPEAT_WINDOWS,
+) -> Dict[str, Any]:
+    """
+    按首单月份分组计算同期群留存矩阵、收入矩阵和复购率
+
+    created_at 为 datetime64[s] 数组；留存矩阵第 i 行第 j 列为第 i 个同期群中
+    在首单后第 j 个月仍有下单的用户数
+    """
+    if len(user_ids) == 0:
+        return {
+            "cohorts": [],
+            "cohort_sizes": [],
+            "retention": [],
+            "revenue": [],
+            "repeat_rates": {str(w): [] for w in windows},
+        }
+
+    # 按用户、下单时间排序，每个用户的第一条即首单
+    order = np.lexsort((created_at, user_ids))
+    user_ids, created_at, amounts = user_ids[order], created_at[order], amounts[order]
+    is_first = np.ones(len(user_ids), dtype=bool)
+    is_first[1:] = user_ids[1:] != user_ids[:-1]
+    first_idx = np.flatnonzero(is_first)
+    user_idx = np.cumsum(is_first) - 1  # 每笔订单所属用户的序号
+
+    months = created_at.astype("datetime64[M]")
+    first_month = months[first_idx]
+    cohorts, cohort_of_user = np.unique(first_month, return_inverse=True)
+    cohort_idx = cohort_of_user[user_idx]
+    offset = (months - first_month[user_idx]).astype(np.int64)
+
+    n_cohorts = len(cohorts)
+    n_offsets = int(offset.max()) + 1
+    cohort_sizes = np.bincount(cohort_of_user, minlength=n_cohorts)
+
+    # 同一用户同一月份多次下单只计一次
+    active = np.zeros(len(user_ids), dtype=bool)
+    active[first_idx] = True
+    active[1:] |= (user_idx[1:] != user_idx[:-1]) | (offset[1:] != offset[:-1])
+    retention = np.zeros((n_cohorts, n_offsets), dtype=np.int64)
+    np.add.at(retention, (cohort_idx[active], offset[active]), 1)
+
+    revenue = np.zeros((n_cohorts, n_offsets), dtype=np.float64)
+    np.add.at(revenue, (cohort_idx, offset), amounts)
+
+    # 首单之后第二单的间隔天数，没有第二单的用户为无穷大
+    has_second = np.zeros(len(first_idx), dtype=bool)
+    second_idx = first_idx + 1
+    valid = second_idx < len(user_ids)
+    has_second[valid] = ~is_first[second_idx[valid]]
+    gap_days = np.full(len(first_idx), np.inf)
+    gap_days[has_second] = (
+        (created_at[second_idx[has_second]] - created_at[first_idx[has_second]])
+        .astype("timedelta64[s]").astype(np.int64) / 86400
+    )
+    repeat_rates = {
+        str(w): (np.bincount(cohort_of_user, weights=gap_days <= w, minlength=n_cohorts)
+                 / cohort_sizes).round(4).tolist()
+        for w in windows
+    }
+
+    return {
+        "cohorts": [str(c) for c in cohorts],
+        "cohort_sizes": cohort_sizes.tolist(),
+        "retention": retention.tolist(),
+        "revenue": revenue.round(2).tolist(),
+        "repeat_rates": repeat_rates,
+    }
+
+
+class ReportService:
+    @staticmethod
+    def _cache_key(start_date: datetime, end_date: datetime) -> str:
+        return f"reports:cohort:{start_date:%Y%m%d}:{end_date:%Y%m%d}"
+
+    @staticmethod
+    async def load_orders(
+        start_date: datetime, end_date: datetime
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        分批流式读取已支付订单的 (user_id, created_at, total_amount)，转换为 NumPy 数组
+
+        只读取首单（按全部历史订单计算）落在时间范围内的用户，范围之前已下过单的老用户
+        不会被误归入范围内的同期群
+        """
+        chunk_size = settings.REPORT_CHUNK_SIZE
+        user_ids, created_at, amounts = [], [], []
+        cohort_users = (
+            select(Order.user_id)
+            .filter(Order.status.in_(PAID_ORDER_STATUSES))
+            .group_by(Order.user_id)
+            .having(func.min(Order.created_at).between(start_date, end_date))
+        )
+        async with AsyncSessionLocal() as db:
+            result = await db.stream(
+                select(Order.user_id, Order.created_at, Order.total_amount)
+                .filter(
+                    Order.user_id.in_(cohort_users),
+                    Order.status.in_(PAID_ORDER_STATUSES),
+                    Order.created_at >= start_date,
+                    Order.created_at <= end_date,
+                )
+                .execution_options(yield_per=chunk_size)
+            )
+            async for rows in result.partitions(chunk_size):
+                columns = list(zip(*rows))
+                user_ids.append(np.array(columns[0], dtype=np.int64))
+                created_at.append(np.array(columns[1], dtype="datetime64[s]"))
+                amounts.append(np.array(columns[2], dtype=np.float64))
+
+        if not user_ids:
+            return (
+                np.empty(0, dtype=np.int64),
+                np.empty(0, dtype="datetime64[s]"),
+                np.empty(0, dtype=np.float64),
+            )
+        return np.concatenate(user_ids), np.concatenate(created_at), np.concatenate(amounts)
+
+    @staticmethod
+    async def generate_cohort_report(start_date: datetime, end_date: datetime) -> Dict[str, Any]:
+        """
+        计算同期群报表并写入缓存
+        """
+        key = ReportService._cache_key(start_date, end_date)
+        try:
+            report = cohort_report(*await ReportService.load_orders(start_date, end_date))
+            report.update(
+                start_date=start_date.isoformat(),
+                end_date=end_date.isoformat(),
+                generated_at=datetime.now().isoformat(),
+            )
+            await redis.set(key, json.dumps(report), ex=settings.REPORT_CACHE_TTL_SECONDS)
+            return report
+        finally:
+            await redis.delete(f"{key}:pending")
+
+    @staticmethod
+    async def get_cached_cohort_report(
+        start_date: datetime, end_date: datetime
+    ) -> Optional[Dict[str, Any]]:
+        """
+        读取缓存的同期群报表，不存在时返回 None
+        """
+        raw = await redis.get(ReportService._cache_key(start_date, end_date))
+        return json.loads(raw) if raw else None
+
+    @staticmethod
+    async def mark_pending(start_date: datetime, end_date: datetime) -> bool:
+        """
+        标记报表正在生成，已有相同任务在执行时返回 False
+        """
+        key = f"{ReportService._cache_key(start_date, end_date)}:pending"
+        return bool(await redis.set(key, 1, nx=True, ex=settings.REPORT_TASK_TIMEOUT_SECONDS))
+
+
+report_service = ReportService()
@@ -1,145 +1,1020 @@
+import asyncio
+import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_
-from sqlalchemy.orm import Session
-from app.models.statistics import SalesTrend, ProductRanking
+from sqlalchemy import func, and_, case, delete, insert, literal_column, select
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import StaleWhileRevalidateCache
+from app.core.config import settings
+from app.core.counters import daily_counters
+from app.db.session import AsyncSessionLocal
+from app.models.statistics import (
+    Statistics,
+    SalesTrend,
+    ProductRanking,
+    SalesRollup,
+    GeoSalesDaily,
+    RefundDaily,
+    CategorySalesDaily,
+)
 from app.models.order import Order, OrderItem
 from app.models.user import User
-from app.models.product import Product
+from app.models.product import Product, Category
 from app.models.after_sale import AfterSale
 from app.schemas.statistics import (
+    StatisticsCreate,
     SalesTrendCreate,
     ProductRankingCreate,
     DashboardStats,
 )
 
-def get_dashboard_stats(db: Session) -> DashboardStats:
-    """获取仪表盘统计数据"""
-    # 获取今日开始时间
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    
-    # 总销售额
-    total_sales = db.query(func.sum(Order.total_amount)).filter(
-        Order.status.in_(['paid', 'shipped', 'completed'])
-    ).scalar() or 0
-    
-    # 总订单数
-    total_orders = db.query(func.count(Order.id)).scalar() or 0
-    
-    # 总用户数
-    total_users = db.query(func.count(User.id)).scalar() or 0
-    
-    # 总商品数
-    total_products = db.query(func.count(Product.id)).scalar() or 0
-    
-    # 总退款数和金额
-    total_refunds = db.query(func.count(AfterSale.id)).filter(
-        AfterSale.status == 'completed'
-    ).scalar() or 0
-    refund_amount = db.query(func.sum(AfterSale.refund_amount)).filter(
-        AfterSale.status == 'completed'
-    ).scalar() or 0
-    
-    # 今日销售额
-    today_sales = db.query(func.sum(Order.total_amount)).filter(
-        and_(
-            Order.status.in_(['paid', 'shipped', 'completed']),
-            Order.created_at >= today
-        )
-    ).scalar() or 0
-    
-    # 今日订单数
-    today_orders = db.query(func.count(Order.id)).filter(
-        Order.created_at >= today
-    ).scalar() or 0
-    
-    # 今日新增用户数
-    today_users = db.query(func.count(User.id)).filter(
-        User.created_at >= today
-    ).scalar() or 0
-    
-    # 今日退款数和金额
-    today_refunds = db.query(func.count(AfterSale.id)).filter(
-        and_(
+logger = logging.getLogger(__name__)
+
+# 计入销售额的订单状态
+PAID_ORDER_STATUSES = ['paid', 'shipped', 'completed']
+
+# 汇总粒度，从细到粗
+ROLLUP_RESOLUTIONS = ("hour", "day", "week", "month")
+ROLLUP_METRICS = ("sales_amount", "order_count", "user_count", "refund_count", "refund_amount")
+
+# 各粒度的近似时长，用于估算数据点数
+RESOLUTION_SPANS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+    "month": timedelta(days=30),
+}
+
+# 未指定粒度时单个序列的默认最大点数
+DEFAULT_MAX_POINTS = 200
+
+# 售后统计可用的分组维度
+REFUND_DIMENSIONS = ("type", "reason", "product_id")
+
+
+def bucket_start(dt: datetime, resolution: str) -> datetime:
+    """
+    返回 dt 所在时间段的开始时间（周从周一开始）
+    """
+    if resolution == "hour":
+        return dt.replace(minute=0, second=0, microsecond=0)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    if resolution == "week":
+        return day - timedelta(days=day.weekday())
+    if resolution == "month":
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(bucket: datetime, resolution: str) -> datetime:
+    """
+    返回下一个时间段的开始时间
+    """
+    if resolution == "month":
+        return (bucket.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return bucket + RESOLUTION_SPANS[resolution]
+
+
+def choose_resolution(
+    start: datetime,
+    end: datetime,
+    bucket: Optional[str] = None,
+    max_points: int = DEFAULT_MAX_POINTS,
+) -> str:
+    """
+    选择查询使用的汇总粒度
+
+    指定了分桶大小时直接使用对应的汇总表；否则选择点数不超过 max_points 的最细粒度
+    """
+    if bucket:
+        return bucket
+    for resolution in ROLLUP_RESOLUTIONS:
+        if (end - start) / RESOLUTION_SPANS[resolution] <= max_points:
+            return resolution
+    return ROLLUP_RESOLUTIONS[-1]
+
+
+def lttb(xs: List[float], ys: List[float], threshold: int) -> List[int]:
+    """
+    Largest-Triangle-Three-Buckets 降采样，返回保留的点的下标
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    selected = [0]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # 下一个桶的平均点
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+
+        # 当前桶中与上一个选中点、下一个桶平均点构成三角形面积最大的点
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs(
+                (xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a])
+            )
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+# 仪表盘缓存，所有管理员共享
+dashboard_cache = StaleWhileRevalidateCache(
+    "statistics:dashboard",
+    ttl=settings.DASHBOARD_CACHE_TTL_SECONDS,
+    stale_ttl=settings.DASHBOARD_CACHE_STALE_SECONDS,
+)
+
+
+class StatisticsService:
+    @staticmethod
+    async def _scalar(db: AsyncSession, stmt) -> Any:
+        result = await db.execute(stmt)
+        return result.scalar() or 0
+
+    @staticmethod
+    async def _fetch_one(stmt) -> Any:
+        """
+        在独立的连接上执行单行聚合查询，便于多个查询并发执行
+        """
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(stmt)
+            return result.one()
+
+    @staticmethod
+    def _between(column, since: Optional[datetime], until: Optional[datetime]):
+        conditions = []
+        if since is not None:
+            conditions.append(column >= since)
+        if until is not None:
+            conditions.append(column < until)
+        return conditions
+
+    @staticmethod
+    def _order_aggregates(
+        today: datetime, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ):
+        """
+        订单表条件聚合：总订单数、已支付订单数、总销售额、今日订单数、今日销售额
+
+        since/until 限定下单时间范围，用于计算快照之后的增量或截至某天的累计值
+        """
+        paid = Order.status.in_(PAID_ORDER_STATUSES)
+        is_today = Order.created_at >= today
+        return select(
+            func.count(Order.id),
+            func.coalesce(func.sum(case((paid, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((paid, Order.total_amount), else_=0)), 0),
+            func.coalesce(func.sum(case((is_today, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(paid, is_today), Order.total_amount), else_=0)), 0),
+        ).filter(*StatisticsService._between(Order.created_at, since, until))
+
+    @staticmethod
+    def _user_aggregates(
+        today: datetime, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ):
+        """
+        用户表条件聚合：总用户数、今日新增用户数
+        """
+        return select(
+            func.count(User.id),
+            func.coalesce(func.sum(case((User.created_at >= today, 1), else_=0)), 0),
+        ).filter(*StatisticsService._between(User.created_at, since, until))
+
+    @staticmethod
+    def _product_aggregates():
+        """
+        商品表聚合：总商品数
+        """
+        return select(func.count(Product.id))
+
+    @staticmethod
+    def _refund_aggregates(
+        today: datetime, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ):
+        """
+        已完成售后条件聚合：总退款数、总退款金额、今日退款数、今日退款金额
+        """
+        is_today = AfterSale.complete_time >= today
+        return select(
+            func.count(AfterSale.id),
+            func.coalesce(func.sum(AfterSale.refund_amount), 0),
+            func.coalesce(func.sum(case((is_today, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((is_today, AfterSale.refund_amount), else_=0)), 0),
+        ).filter(
             AfterSale.status == 'completed',
-            AfterSale.complete_time >= today
+            *StatisticsService._between(AfterSale.complete_time, since, until),
         )
-    ).scalar() or 0
-    today_refund_amount = db.query(func.sum(AfterSale.refund_amount)).filter(
-        and_(
-            AfterSale.status == 'completed',
-            AfterSale.complete_time >= today
-        )
-    ).scalar() or 0
-    
-    return DashboardStats(
-        total_sales=total_sales,
-        total_orders=total_orders,
-        total_users=total_users,
-        total_products=total_products,
-        total_refunds=total_refunds,
-        refund_amount=refund_amount,
-        today_sales=today_sales,
-        today_orders=today_orders,
-        today_users=today_users,
-        today_refunds=today_refunds,
-        today_refund_amount=today_refund_amount,
-    )
-
-def get_sales_trends(
-    db: Session,
-    start_date: datetime,
-    end_date: datetime,
-    skip: int = 0,
-    limit: int = 100,
-) -> List[SalesTrend]:
-    """获取销售趋势数据"""
-    return (
-        db.query(SalesTrend)
-        .filter(
-            and_(
-                SalesTrend.date >= start_date,
-                SalesTrend.date <= end_date
-            )
-        )
-        .order_by(SalesTrend.date.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-def create_sales_trend(
-    db: Session, trend_in: SalesTrendCreate
-) -> SalesTrend:
-    """创建销售趋势数据"""
-    db_trend = SalesTrend(**trend_in.dict())
-    db.add(db_trend)
-    db.commit()
-    db.refresh(db_trend)
-    return db_trend
-
-def get_product_rankings(
-    db: Session,
-    date: datetime,
-    skip: int = 0,
-    limit: int = 100,
-) -> List[ProductRanking]:
-    """获取商品排行数据"""
-    return (
-        db.query(ProductRanking)
-        .filter(ProductRanking.date == date)
-        .order_by(ProductRanking.sales_amount.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-def create_product_ranking(
-    db: Session, ranking_in: ProductRankingCreate
-) -> ProductRanking:
-    """创建商品排行数据"""
-    db_ranking = ProductRanking(**ranking_in.dict())
-    db.add(db_ranking)
-    db.commit()
-    db.refresh(db_ranking)
-    return db_ranking 
\ No newline at end of file
+
+    @staticmethod
+    async def _latest_snapshot(today: datetime) -> Optional[Statistics]:
+        # 只使用已结束日期的快照，今天的数据始终由增量查询得到
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Statistics)
+                .filter(Statistics.date < today)
+                .order_by(Statistics.date.desc())
+                .limit(1)
+            )
+            return result.scalar_one_or_none()
+
+    @staticmethod
+    async def _recent_trends_and_rankings(today: datetime):
+        # 最近7天销售趋势及最近一天的商品排行
+        async with AsyncSessionLocal() as db:
+            sales_trend = await StatisticsService.get_sales_trends(
+                db, start_date=today - timedelta(days=7), end_date=today
+            )
+            product_rankings = await StatisticsService.get_product_rankings(
+                db, date=today - timedelta(days=1), limit=10
+            )
+        return sales_trend, product_rankings
+
+    @staticmethod
+    async def get_dashboard_stats() -> DashboardStats:
+        """
+        获取仪表盘统计数据（带缓存，过期后先返回旧值并在后台刷新）
+        """
+        data = await dashboard_cache.get(StatisticsService._compute_dashboard_stats)
+        stats = DashboardStats(**data)
+
+        # 今日数据优先使用实时计数器
+        try:
+            today = await daily_counters.get(datetime.utcnow())
+        except Exception as e:
+            logger.warning(f"Daily counter read error: {str(e)}")
+            today = None
+        if today:
+            stats.today_sales = today.get("sales_amount", 0)
+            stats.today_orders = today.get("order_count", 0)
+            stats.today_users = today.get("user_count", 0)
+            stats.today_refunds = today.get("refund_count", 0)
+            stats.today_refund_amount = today.get("refund_amount", 0)
+        return stats
+
+    @staticmethod
+    async def _compute_dashboard_stats() -> Dict[str, Any]:
+        return jsonable_encoder(await StatisticsService.compute_dashboard_stats())
+
+    @staticmethod
+    async def compute_dashboard_stats() -> DashboardStats:
+        """
+        计算仪表盘统计数据
+
+        累计值取最近一次每日快照，再加上快照之后的增量，避免扫描全部历史数据；
+        每张表只执行一次条件聚合查询，各查询在独立连接上并发执行
+        """
+        # 获取今日开始时间（UTC，与 created_at 及实时计数器一致）
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        fetch_one = StatisticsService._fetch_one
+
+        snapshot = await StatisticsService._latest_snapshot(today)
+        since = snapshot.date + timedelta(days=1) if snapshot else None
+
+        orders, users, products, refunds, (sales_trend, product_rankings) = await asyncio.gather(
+            fetch_one(StatisticsService._order_aggregates(today, since)),
+            fetch_one(StatisticsService._user_aggregates(today, since)),
+            fetch_one(StatisticsService._product_aggregates()),
+            fetch_one(StatisticsService._refund_aggregates(today, since)),
+            StatisticsService._recent_trends_and_rankings(today),
+        )
+        total_orders, paid_orders, total_sales, today_orders, today_sales = orders
+        total_users, today_users = users
+        total_refunds, total_refund_amount, today_refunds, today_refund_amount = refunds
+
+        conversion_rate = None
+        if snapshot:
+            total_orders += snapshot.total_orders
+            paid_orders += (snapshot.extra or {}).get("paid_orders", 0)
+            total_sales += snapshot.total_sales
+            total_users += snapshot.total_users
+            total_refunds += snapshot.total_refunds
+            total_refund_amount += snapshot.total_refund_amount
+            conversion_rate = snapshot.conversion_rate
+
+        return DashboardStats(
+            total_sales=total_sales,
+            total_orders=total_orders,
+            total_users=total_users,
+            total_products=products[0],
+            total_refunds=total_refunds,
+            total_refund_amount=total_refund_amount,
+            today_sales=today_sales,
+            today_orders=today_orders,
+            today_users=today_users,
+            today_refunds=today_refunds,
+            today_refund_amount=today_refund_amount,
+            avg_order_amount=total_sales / paid_orders if paid_orders else 0,
+            conversion_rate=conversion_rate,
+            sales_trend=sales_trend,
+            product_rankings=product_rankings,
+        )
+
+    @staticmethod
+    async def get_sales_trends(
+        db: AsyncSession,
+        *,
+        start_date: datetime,
+        end_date: datetime,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[SalesTrend]:
+        """
+        获取销售趋势数据
+        """
+        result = await db.execute(
+            select(SalesTrend)
+            .filter(
+                and_(
+                    SalesTrend.date >= start_date,
+                    SalesTrend.date <= end_date
+                )
+            )
+            .order_by(SalesTrend.date.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_sales_series(
+        db: AsyncSession,
+        *,
+        start_date: datetime,
+        end_date: datetime,
+        bucket: Optional[str] = None,
+        max_points: int = DEFAULT_MAX_POINTS,
+    ) -> Dict[str, Any]:
+        """
+        获取销售趋势序列
+
+        从汇总表读取数据，空时间段补零，点数超过 max_points 时按销售额做 LTTB 降采样
+        """
+        resolution = choose_resolution(start_date, end_date, bucket, max_points)
+        rollups = await StatisticsService.get_sales_rollups(
+            db, resolution=resolution, start_date=start_date, end_date=end_date
+        )
+        by_bucket = {row.bucket: row for row in rollups}
+
+        buckets = []
+        current = bucket_start(start_date, resolution)
+        while current <= end_date:
+            buckets.append(current)
+            current = next_bucket(current, resolution)
+
+        series = {
+            m: [getattr(by_bucket[b], m) if b in by_bucket else 0 for b in buckets]
+            for m in ROLLUP_METRICS
+        }
+        if len(buckets) > max_points:
+            keep = lttb(
+                [b.timestamp() for b in buckets], series["sales_amount"], max_points
+            )
+            buckets = [buckets[i] for i in keep]
+            series = {m: [values[i] for i in keep] for m, values in series.items()}
+
+        return {"resolution": resolution, "buckets": buckets, **series}
+
+    @staticmethod
+    async def create_sales_trend(
+        db: AsyncSession, *, obj_in: SalesTrendCreate
+    ) -> SalesTrend:
+        """
+        创建销售趋势数据
+        """
+        db_trend = SalesTrend(**obj_in.dict())
+        db.add(db_trend)
+        await db.commit()
+        await db.refresh(db_trend)
+        return db_trend
+
+    @staticmethod
+    async def get_product_rankings(
+        db: AsyncSession,
+        *,
+        date: datetime,
+        skip: int = 0,
+        limit: int = 100,
+    ) -> List[ProductRanking]:
+        """
+        获取商品排行数据
+        """
+        result = await db.execute(
+            select(ProductRanking)
+            .filter(ProductRanking.date == date)
+            .order_by(ProductRanking.sales_amount.desc())
+            .offset(skip)
+            .limit(limit)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def count_product_rankings(db: AsyncSession, *, date: datetime) -> int:
+        """
+        统计指定日期的商品排行条数
+        """
+        return await StatisticsService._scalar(
+            db,
+            select(func.count(ProductRanking.id)).filter(ProductRanking.date == date),
+        )
+
+    @staticmethod
+    async def create_product_ranking(
+        db: AsyncSession, *, obj_in: ProductRankingCreate
+    ) -> ProductRanking:
+        """
+        创建商品排行数据
+        """
+        db_ranking = ProductRanking(**obj_in.dict())
+        db.add(db_ranking)
+        await db.commit()
+        await db.refresh(db_ranking)
+        return db_ranking
+
+    @staticmethod
+    async def daily_totals(db: AsyncSession, date: datetime) -> Dict[str, Any]:
+        """
+        统计指定日期的销售额、订单数、新增用户数、退款数和退款金额
+        """
+        next_day = date + timedelta(days=1)
+
+        order_count, sales_amount = (await db.execute(
+            select(
+                func.count(Order.id),
+                func.coalesce(func.sum(
+                    case((Order.status.in_(PAID_ORDER_STATUSES), Order.total_amount), else_=0)
+                ), 0),
+            ).filter(Order.created_at >= date, Order.created_at < next_day)
+        )).one()
+
+        user_count = await StatisticsService._scalar(
+            db,
+            select(func.count(User.id)).filter(
+                User.created_at >= date, User.created_at < next_day
+            ),
+        )
+
+        refund_count, refund_amount = (await db.execute(
+            select(
+                func.count(AfterSale.id),
+                func.coalesce(func.sum(AfterSale.refund_amount), 0),
+            ).filter(
+                AfterSale.status == 'completed',
+                AfterSale.complete_time >= date,
+                AfterSale.complete_time < next_day,
+            )
+        )).one()
+
+        return {
+            "sales_amount": float(sales_amount),
+            "order_count": order_count,
+            "user_count": user_count,
+            "refund_amount": float(refund_amount),
+            "refund_count": refund_count,
+        }
+
+    @staticmethod
+    async def generate_sales_trend(db: AsyncSession, date: datetime) -> None:
+        """
+        生成指定日期的销售趋势数据（不提交事务）
+
+        先删除当天已有的数据再写入，重复执行结果不变
+        """
+        await db.execute(delete(SalesTrend).where(SalesTrend.date == date))
+
+        # 创建销售趋势数据
+        trend_in = SalesTrendCreate(
+            date=date, **await StatisticsService.daily_totals(db, date)
+        )
+        db.add(SalesTrend(**trend_in.dict()))
+
+    @staticmethod
+    async def generate_product_rankings(db: AsyncSession, date: datetime) -> None:
+        """
+        生成指定日期的商品排行数据（不提交事务）
+
+        一次分组查询汇总当天各商品的销售额和销量，并用窗口函数按销售额计算排名；
+        先删除当天已有的数据再写入，重复执行结果不变
+        """
+        await db.execute(delete(ProductRanking).where(ProductRanking.date == date))
+
+        next_day = date + timedelta(days=1)
+        sales_amount = func.coalesce(func.sum(OrderItem.total_amount), 0)
+
+        result = await db.execute(
+            select(
+                OrderItem.product_id,
+                sales_amount.label("sales_amount"),
+                func.coalesce(func.sum(OrderItem.quantity), 0).label("sales_count"),
+                func.rank().over(order_by=sales_amount.desc()).label("ranking"),
+            )
+            .join(Product, Product.id == OrderItem.product_id)
+            .filter(
+                OrderItem.created_at >= date,
+                OrderItem.created_at < next_day,
+            )
+            .group_by(OrderItem.product_id)
+        )
+        rows = [
+            dict(row._mapping, date=date, view_count=0)  # 浏览量需要另外统计
+            for row in result
+        ]
+        if rows:
+            await db.execute(insert(ProductRanking), rows)
+
+    @staticmethod
+    async def get_sales_rollups(
+        db: AsyncSession, *, resolution: str, start_date: datetime, end_date: datetime
+    ) -> List[SalesRollup]:
+        """
+        获取指定粒度、时间范围内的销售汇总数据
+        """
+        result = await db.execute(
+            select(SalesRollup)
+            .filter(
+                SalesRollup.resolution == resolution,
+                SalesRollup.bucket >= bucket_start(start_date, resolution),
+                SalesRollup.bucket <= end_date,
+            )
+            .order_by(SalesRollup.bucket)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def _hourly_totals(db: AsyncSession, date: datetime) -> Dict[datetime, Dict[str, Any]]:
+        """
+        按小时分组统计指定日期的订单、用户和退款数据
+        """
+        next_day = date + timedelta(days=1)
+        totals: Dict[datetime, Dict[str, Any]] = {}
+
+        def add(hour: int, **values: Any) -> None:
+            bucket = date + timedelta(hours=hour)
+            totals.setdefault(bucket, dict.fromkeys(ROLLUP_METRICS, 0)).update(values)
+
+        hour = func.hour(Order.created_at)
+        result = await db.execute(
+            select(
+                hour,
+                func.count(Order.id),
+                func.coalesce(func.sum(
+                    case((Order.status.in_(PAID_ORDER_STATUSES), Order.total_amount), else_=0)
+                ), 0),
+            )
+            .filter(Order.created_at >= date, Order.created_at < next_day)
+            .group_by(hour)
+        )
+        for h, order_count, sales_amount in result:
+            add(h, order_count=order_count, sales_amount=float(sales_amount))
+
+        hour = func.hour(User.created_at)
+        result = await db.execute(
+            select(hour, func.count(User.id))
+            .filter(User.created_at >= date, User.created_at < next_day)
+            .group_by(hour)
+        )
+        for h, user_count in result:
+            add(h, user_count=user_count)
+
+        hour = func.hour(AfterSale.complete_time)
+        result = await db.execute(
+            select(hour, func.count(AfterSale.id), func.coalesce(func.sum(AfterSale.refund_amount), 0))
+            .filter(
+                AfterSale.status == 'completed',
+                AfterSale.complete_time >= date,
+                AfterSale.complete_time < next_day,
+            )
+            .group_by(hour)
+        )
+        for h, refund_count, refund_amount in result:
+            add(h, refund_count=refund_count, refund_amount=float(refund_amount))
+
+        return totals
+
+    @staticmethod
+    async def _replace_rollups(
+        db: AsyncSession,
+        resolution: str,
+        start: datetime,
+        end: datetime,
+        rows: Dict[datetime, Dict[str, Any]],
+    ) -> None:
+        """
+        用 rows 替换 [start, end) 内指定粒度的汇总数据
+        """
+        await db.execute(
+            delete(SalesRollup).where(
+                SalesRollup.resolution == resolution,
+                SalesRollup.bucket >= start,
+                SalesRollup.bucket < end,
+            )
+        )
+        if rows:
+            await db.execute(
+                insert(SalesRollup),
+                [dict(values, resolution=resolution, bucket=bucket) for bucket, values in rows.items()],
+            )
+
+    @staticmethod
+    async def _sum_rollups(
+        db: AsyncSession, resolution: str, start: datetime, end: datetime
+    ) -> Dict[str, Any]:
+        """
+        汇总 [start, end) 内指定粒度的数据
+        """
+        result = await db.execute(
+            select(*(func.coalesce(func.sum(getattr(SalesRollup, m)), 0) for m in ROLLUP_METRICS))
+            .filter(
+                SalesRollup.resolution == resolution,
+                SalesRollup.bucket >= start,
+                SalesRollup.bucket < end,
+            )
+        )
+        return dict(zip(ROLLUP_METRICS, result.one()))
+
+    @staticmethod
+    async def _update_period_rollups(db: AsyncSession, resolution: str, start: datetime) -> None:
+        """
+        由天汇总重新计算从 start 开始的周或月汇总
+        """
+        end = next_bucket(start, resolution)
+        totals = await StatisticsService._sum_rollups(db, "day", start, end)
+        await StatisticsService._replace_rollups(db, resolution, start, end, {start: totals})
+
+    @staticmethod
+    async def generate_sales_rollups(
+        db: AsyncSession, date: datetime, periods: bool = True
+    ) -> None:
+        """
+        重新生成指定日期的小时、天汇总（不提交事务）
+
+        periods 为 True 时同时更新所在周、月的汇总；并行回填时应关闭，
+        待全部日期完成后再统一调用 rebuild_period_rollups
+        """
+        next_day = date + timedelta(days=1)
+        hourly = await StatisticsService._hourly_totals(db, date)
+        await StatisticsService._replace_rollups(db, "hour", date, next_day, hourly)
+
+        daily = {
+            m: sum(values[m] for values in hourly.values()) for m in ROLLUP_METRICS
+        }
+        await StatisticsService._replace_rollups(db, "day", date, next_day, {date: daily})
+
+        if periods:
+            for resolution in ("week", "month"):
+                await StatisticsService._update_period_rollups(
+                    db, resolution, bucket_start(date, resolution)
+                )
+
+    @staticmethod
+    async def rebuild_period_rollups(start_date: datetime, end_date: datetime) -> None:
+        """
+        重新计算日期范围涉及的全部周、月汇总
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                for resolution in ("week", "month"):
+                    bucket = bucket_start(start_date, resolution)
+                    while bucket <= end_date:
+                        await StatisticsService._update_period_rollups(db, resolution, bucket)
+                        bucket = next_bucket(bucket, resolution)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def generate_geo_sales(db: AsyncSession, date: datetime) -> None:
+        """
+        重新生成指定日期按收货省份、城市汇总的销售数据（不提交事务）
+        """
+        next_day = date + timedelta(days=1)
+        await db.execute(delete(GeoSalesDaily).where(GeoSalesDaily.date == date))
+
+        paid = Order.status.in_(PAID_ORDER_STATUSES)
+        result = await db.execute(
+            select(
+                Order.receiver_province.label("province"),
+                Order.receiver_city.label("city"),
+                func.count(Order.id).label("order_count"),
+                func.coalesce(func.sum(case((paid, 1), else_=0)), 0).label("paid_order_count"),
+                func.coalesce(func.sum(case((paid, Order.total_amount), else_=0)), 0).label("sales_amount"),
+            )
+            .filter(Order.created_at >= date, Order.created_at < next_day)
+            .group_by(Order.receiver_province, Order.receiver_city)
+        )
+        rows = [dict(row._mapping, date=date) for row in result]
+        if rows:
+            await db.execute(insert(GeoSalesDaily), rows)
+
+    @staticmethod
+    async def get_geo_sales(
+        db: AsyncSession,
+        *,
+        start_date: datetime,
+        end_date: datetime,
+        province: Optional[str] = None,
+        by_city: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        获取日期范围内的地区销售数据，按销售额降序
+        """
+        columns = [GeoSalesDaily.province]
+        if by_city:
+            columns.append(GeoSalesDaily.city)
+        sales_amount = func.sum(GeoSalesDaily.sales_amount)
+        query = (
+            select(
+                *columns,
+                func.sum(GeoSalesDaily.order_count).label("order_count"),
+                func.sum(GeoSalesDaily.paid_order_count).label("paid_order_count"),
+                sales_amount.label("sales_amount"),
+            )
+            .filter(GeoSalesDaily.date >= start_date, GeoSalesDaily.date <= end_date)
+            .group_by(*columns)
+            .order_by(sales_amount.desc())
+        )
+        if province:
+            query = query.filter(GeoSalesDaily.province == province)
+        result = await db.execute(query)
+        return [dict(row._mapping) for row in result]
+
+    @staticmethod
+    async def generate_refund_stats(db: AsyncSession, date: datetime) -> None:
+        """
+        重新生成指定日期按售后类型、原因、商品汇总的售后数据（不提交事务）
+
+        申请数按申请时间归入当天，完成数、退款金额和处理时长按完成时间归入当天
+        """
+        next_day = date + timedelta(days=1)
+        await db.execute(delete(RefundDaily).where(RefundDaily.date == date))
+
+        keys = (AfterSale.type, AfterSale.reason, OrderItem.product_id)
+        rows: Dict[tuple, Dict[str, Any]] = {}
+
+        def add(key: tuple, **values: Any) -> None:
+            rows.setdefault(key, {
+                "applied_count": 0,
+                "completed_count": 0,
+                "refund_amount": 0,
+                "total_duration_seconds": 0,
+                "max_duration_seconds": 0,
+            }).update(values)
+
+        result = await db.execute(
+            select(*keys, func.count(AfterSale.id))
+            .join(OrderItem, OrderItem.id == AfterSale.order_item_id)
+            .filter(AfterSale.created_at >= date, AfterSale.created_at < next_day)
+            .group_by(*keys)
+        )
+        for type_, reason, product_id, applied_count in result:
+            add((type_, reason, product_id), applied_count=applied_count)
+
+        duration = func.timestampdiff(
+            literal_column("SECOND"), AfterSale.created_at, AfterSale.complete_time
+        )
+        result = await db.execute(
+            select(
+                *keys,
+                func.count(AfterSale.id),
+                func.coalesce(func.sum(AfterSale.refund_amount), 0),
+                func.coalesce(func.sum(duration), 0),
+                func.coalesce(func.max(duration), 0),
+            )
+            .join(OrderItem, OrderItem.id == AfterSale.order_item_id)
+            .filter(
+                AfterSale.status == 'completed',
+                AfterSale.complete_time >= date,
+                AfterSale.complete_time < next_day,
+            )
+            .group_by(*keys)
+        )
+        for type_, reason, product_id, count, amount, total, longest in result:
+            add(
+                (type_, reason, product_id),
+                completed_count=count,
+                refund_amount=float(amount),
+                total_duration_seconds=int(total),
+                max_duration_seconds=int(longest),
+            )
+
+        if rows:
+            await db.execute(insert(RefundDaily), [
+                dict(values, date=date, type=type_, reason=reason, product_id=product_id)
+                for (type_, reason, product_id), values in rows.items()
+            ])
+
+    @staticmethod
+    async def get_refund_stats(
+        db: AsyncSession,
+        *,
+        start_date: datetime,
+        end_date: datetime,
+        group_by: List[str],
+        type: Optional[str] = None,
+        product_id: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        获取日期范围内的售后统计，按 group_by 中的维度分组，按退款金额降序
+        """
+        columns = [getattr(RefundDaily, dimension) for dimension in group_by]
+        refund_amount = func.sum(RefundDaily.refund_amount)
+        completed_count = func.sum(RefundDaily.completed_count)
+        query = (
+            select(
+                *columns,
+                func.sum(RefundDaily.applied_count).label("applied_count"),
+                completed_count.label("completed_count"),
+                refund_amount.label("refund_amount"),
+                func.sum(RefundDaily.total_duration_seconds).label("total_duration_seconds"),
+                func.max(RefundDaily.max_duration_seconds).label("max_duration_seconds"),
+            )
+            .filter(RefundDaily.date >= start_date, RefundDaily.date <= end_date)
+            .group_by(*columns)
+            .order_by(refund_amount.desc())
+        )
+        if type:
+            query = query.filter(RefundDaily.type == type)
+        if product_id is not None:
+            query = query.filter(RefundDaily.product_id == product_id)
+
+        items = []
+        for row in await db.execute(query):
+            item = dict(row._mapping)
+            total = item.pop("total_duration_seconds") or 0
+            longest = item.pop("max_duration_seconds") or 0
+            completed = item["completed_count"] or 0
+            item["avg_duration_hours"] = total / completed / 3600 if completed else 0
+            item["max_duration_hours"] = longest / 3600
+            items.append(item)
+        return items
+
+    @staticmethod
+    async def generate_category_sales(db: AsyncSession, date: datetime) -> None:
+        """
+        重新生成指定日期的分类销售数据（不提交事务）
+
+        一次分组查询得到各分类直属商品的销售额（只计已支付订单），再沿 parent_id
+        累加到所有祖先分类
+        """
+        next_day = date + timedelta(days=1)
+        await db.execute(delete(CategorySalesDaily).where(CategorySalesDaily.date == date))
+
+        result = await db.execute(
+            select(
+                Product.category_id,
+                func.coalesce(func.sum(OrderItem.total_amount), 0),
+                func.coalesce(func.sum(OrderItem.quantity), 0),
+            )
+            .join(Order, Order.id == OrderItem.order_id)
+            .join(Product, Product.id == OrderItem.product_id)
+            .filter(
+                Order.created_at >= date,
+                Order.created_at < next_day,
+                Order.status.in_(PAID_ORDER_STATUSES),
+                Product.category_id.isnot(None),
+            )
+            .group_by(Product.category_id)
+        )
+        direct = {category_id: (float(amount), int(count)) for category_id, amount, count in result}
+        if not direct:
+            return
+
+        parents = dict((await db.execute(select(Category.id, Category.parent_id))).all())
+        rows: Dict[int, Dict[str, Any]] = {}
+
+        def row(category_id: int) -> Dict[str, Any]:
+            return rows.setdefault(category_id, {
+                "date": date,
+                "category_id": category_id,
+                "parent_id": parents.get(category_id),
+                "sales_amount": 0,
+                "sales_count": 0,
+                "direct_sales_amount": 0,
+                "direct_sales_count": 0,
+            })
+
+        for category_id, (amount, count) in direct.items():
+            row(category_id).update(direct_sales_amount=amount, direct_sales_count=count)
+            # 累加到自身及全部祖先分类，visited 防止数据异常形成环
+            visited = set()
+            current = category_id
+            while current is not None and current not in visited:
+                visited.add(current)
+                item = row(current)
+                item["sales_amount"] += amount
+                item["sales_count"] += count
+                current = parents.get(current)
+
+        await db.execute(insert(CategorySalesDaily), list(rows.values()))
+
+    @staticmethod
+    async def get_category_sales(
+        db: AsyncSession,
+        *,
+        start_date: datetime,
+        end_date: datetime,
+        category_id: Optional[int] = None,
+        parent_id: Optional[int] = None,
+    ) -> List[CategorySalesDaily]:
+        """
+        获取分类销售趋势
+
+        指定 category_id 时返回该分类的数据，否则返回 parent_id 下各子分类
+        （parent_id 为空时为顶级分类）的数据
+        """
+        query = select(CategorySalesDaily).filter(
+            CategorySalesDaily.date >= start_date,
+            CategorySalesDaily.date <= end_date,
+        )
+        if category_id is not None:
+            query = query.filter(CategorySalesDaily.category_id == category_id)
+        elif parent_id is not None:
+            query = query.filter(CategorySalesDaily.parent_id == parent_id)
+        else:
+            query = query.filter(CategorySalesDaily.parent_id.is_(None))
+        result = await db.execute(
+            query.order_by(CategorySalesDaily.date, CategorySalesDaily.category_id)
+        )
+        return result.scalars().all()
+
+    @staticmethod
+    async def generate_statistics_snapshot(db: AsyncSession, date: datetime) -> None:
+        """
+        生成截至指定日期结束时的 KPI 快照（不提交事务）
+
+        系统没有记录商品浏览量，转化率留空
+        """
+        next_day = date + timedelta(days=1)
+        await db.execute(delete(Statistics).where(Statistics.date == date))
+
+        orders = (await db.execute(StatisticsService._order_aggregates(date, until=next_day))).one()
+        users = (await db.execute(StatisticsService._user_aggregates(date, until=next_day))).one()
+        refunds = (await db.execute(StatisticsService._refund_aggregates(date, until=next_day))).one()
+        total_products = await StatisticsService._scalar(
+            db, StatisticsService._product_aggregates()
+        )
+
+        total_orders, paid_orders, total_sales, day_orders, _ = orders
+        db.add(Statistics(**StatisticsCreate(
+            date=date,
+            total_sales=total_sales,
+            total_orders=total_orders,
+            total_users=users[0],
+            total_products=total_products,
+            total_refunds=refunds[0],
+            total_refund_amount=refunds[1],
+            avg_order_amount=total_sales / paid_orders if paid_orders else 0,
+            conversion_rate=None,
+            extra={"paid_orders": paid_orders, "orders": day_orders},
+        ).dict()))
+
+    @staticmethod
+    async def rebuild_rollups(date: datetime) -> None:
+        """
+        在独立事务中重新生成指定日期的销售汇总
+        """
+        async with AsyncSessionLocal() as db:
+            try:
+                await StatisticsService.generate_sales_rollups(db, date)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+    @staticmethod
+    async def rebuild_day(date: datetime, periods: bool = True) -> None:
+        """
+        在独立事务中重新生成指定日期的全部日统计数据
+
+        只能生成已结束（UTC）的日期，否则快照会遗漏当天剩余的数据
+        """
+        if date >= datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0):
+            raise ValueError(f"{date.date()} 尚未结束，不能生成日统计")
+        async with AsyncSessionLocal() as db:
+            try:
+                await StatisticsService.generate_sales_trend(db, date)
+                await StatisticsService.generate_product_rankings(db, date)
+                await StatisticsService.generate_statistics_snapshot(db, date)
+                await StatisticsService.generate_sales_rollups(db, date, periods)
+                await StatisticsService.generate_geo_sales(db, date)
+                await StatisticsService.generate_refund_stats(db, date)
+                await StatisticsService.generate_category_sales(db, date)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+
+statistics_service = StatisticsService()
@@ -2,7 +2,7 @@ from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from app import crud, models
 from app.schemas.user import UserCreate, UserUpdate
-from app.core.security import get_password_hash, verify_password
+from app.core.security import verify_password_async
 
 
 class UserService:
@@ -49,10 +49,8 @@ class UserService:
         """
         创建用户
         """
-        user_data = obj_in.dict()
-        user_data["hashed_password"] = get_password_hash(obj_in.password)
-        del user_data["password"]
-        return await crud.user.create(db=db, obj_in=user_data)
+        # 密码哈希由 crud.user.create 在哈希执行器中完成
+        return await crud.user.create(db=db, obj_in=obj_in.dict())
 
     @staticmethod
     async def update_user(
@@ -67,11 +65,8 @@ class UserService:
         user = await crud.user.get(db=db, id=user_id)
         if not user:
             return None
-        update_data = obj_in.dict(exclude_unset=True)
-        if "password" in update_data:
-            update_data["hashed_password"] = get_password_hash(update_data["password"])
-            del update_data["password"]
-        return await crud.user.update(db=db, db_obj=user, obj_in=update_data)
+        # 密码哈希由 crud.user.update 在哈希执行器中完成
+        return await crud.user.update(db=db, db_obj=user, obj_in=obj_in)
 
     @staticmethod
     async def authenticate(
@@ -86,7 +81,7 @@ class UserService:
         user = await crud.user.get_by_email(db=db, email=email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await verify_password_async(password, user.hashed_password):
             return None
         return user
 
@@ -0,0 +1,72 @@
+"""
+统计数据回填
+
+    python -m app.tasks.backfill --start 2024-01-01 --end 2024-12-31 --workers 8
+    python -m app.tasks.backfill --start 2024-01-01 --end 2024-12-31 --celery
+
+每天的数据在独立事务中先删除再写入，可重复执行。
+"""
+import argparse
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+from app.services.statistics import statistics_service
+from app.tasks.celery_app import run_async
+from app.tasks.statistics import backfill_statistics, day_range, last_ended_day
+
+logger = logging.getLogger(__name__)
+
+
+def _rebuild_day(day: str) -> str:
+    # 子进程中执行，复用该进程的事件循环和数据库连接池；周、月汇总在全部完成后统一计算
+    run_async(statistics_service.rebuild_day(datetime.fromisoformat(day), periods=False))
+    return day
+
+
+def backfill_local(start: datetime, end: datetime, workers: int) -> int:
+    """
+    使用本地进程池并行回填，返回成功的天数
+    """
+    days = [day.date().isoformat() for day in day_range(start, end)]
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_rebuild_day, day): day for day in days}
+        for future in as_completed(futures):
+            try:
+                future.result()
+                done += 1
+            except Exception as e:
+                logger.error(f"Statistics backfill failed for {futures[future]}: {str(e)}")
+    run_async(statistics_service.rebuild_period_rollups(start, end))
+    logger.info(f"Statistics backfill finished: {done}/{len(days)} days")
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="重新生成销售趋势和商品排行数据")
+    parser.add_argument("--start", required=True, type=datetime.fromisoformat, help="开始日期，如 2024-01-01")
+    parser.add_argument("--end", required=True, type=datetime.fromisoformat, help="结束日期（包含）")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="本地进程数")
+    parser.add_argument("--celery", action="store_true", help="分发到 Celery worker 执行")
+    args = parser.parse_args()
+    if args.end < args.start:
+        parser.error("--end 不能早于 --start")
+    # 只回填已结束的日期，今天的数据由实时查询得到
+    if args.end > last_ended_day():
+        args.end = last_ended_day()
+        if args.end < args.start:
+            parser.error("--start 之后没有已结束的日期")
+
+    logging.basicConfig(level=logging.INFO)
+    if args.celery:
+        backfill_statistics.delay(args.start.date().isoformat(), args.end.date().isoformat())
+        return
+    done = backfill_local(args.start, args.end, args.workers)
+    if done < len(day_range(args.start, args.end)):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 from celery import Celery
 from app.core.config import settings
 
@@ -5,7 +6,7 @@ celery_app = Celery(
     "mall_admin",
     broker=settings.CELERY_BROKER_URL,
     backend=settings.CELERY_RESULT_BACKEND,
-    include=["app.tasks.statistics"]
+    include=["app.tasks.statistics", "app.tasks.email", "app.tasks.reports", "app.tasks.inventory"]
 )
 
 # 配置Celery
@@ -15,6 +16,8 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="Asia/Shanghai",
     enable_utc=True,
+    # 邮件任务使用独立队列，避免被统计任务阻塞
+    task_routes={"app.tasks.email.*": {"queue": settings.MAIL_QUEUE}},
 )
 
 # 配置定时任务
@@ -24,4 +27,37 @@ celery_app.conf.beat_schedule = {
         "schedule": 86400.0,  # 每天执行一次
         "args": (),
     },
-} 
\ No newline at end of file
+    "refresh-sales-rollups": {
+        "task": "app.tasks.statistics.refresh_sales_rollups",
+        "schedule": 3600.0,  # 每小时执行一次
+        "args": (),
+    },
+    "reconcile-daily-counters": {
+        "task": "app.tasks.statistics.reconcile_daily_counters",
+        "schedule": float(settings.DAILY_COUNTERS_RECONCILE_SECONDS),
+        "args": (),
+    },
+    "release-expired-reservations": {
+        "task": "app.tasks.inventory.release_expired_reservations",
+        "schedule": float(settings.INVENTORY_RELEASE_INTERVAL_SECONDS),
+        "args": (),
+    },
+    "sync-reserved-stock": {
+        "task": "app.tasks.inventory.sync_reserved_stock",
+        "schedule": float(settings.INVENTORY_SYNC_INTERVAL_SECONDS),
+        "args": (),
+    },
+} 
+
+# 每个 worker 进程复用同一个事件循环，使异步引擎的连接池在任务间保持可用
+_loop = None
+
+def run_async(coro):
+    """
+    在 worker 进程的事件循环中执行协程
+    """
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop.run_until_complete(coro)
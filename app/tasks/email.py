@@ -0,0 +1,135 @@
+import logging
+import smtplib
+import time
+from contextlib import contextmanager
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formataddr
+from queue import Empty, LifoQueue
+from typing import Iterator
+
+from celery.signals import worker_process_shutdown
+
+from app.core.config import settings
+from app.tasks.celery_app import celery_app
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """
+    Worker 端 SMTP 连接池
+
+    复用已完成 STARTTLS 和登录的连接，取出时用 NOOP 检测连接是否可用，
+    空闲超时的连接会被关闭重建。
+    """
+
+    def __init__(self, maxsize: int, idle_seconds: int):
+        self.maxsize = maxsize
+        self.idle_seconds = idle_seconds
+        self._idle: "LifoQueue[tuple]" = LifoQueue(maxsize=maxsize)
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(
+            settings.SMTP_HOST, settings.SMTP_PORT, timeout=settings.SMTP_TIMEOUT_SECONDS
+        )
+        if settings.SMTP_TLS:
+            server.starttls()
+        if settings.SMTP_USER:
+            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        return server
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def _healthy(self, server: smtplib.SMTP, last_used: float) -> bool:
+        if time.monotonic() - last_used > self.idle_seconds:
+            return False
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    @contextmanager
+    def connection(self) -> Iterator[smtplib.SMTP]:
+        """
+        取出一个可用连接，使用完毕后归还
+        """
+        server = None
+        while server is None:
+            try:
+                candidate, last_used = self._idle.get_nowait()
+            except Empty:
+                server = self._connect()
+                break
+            if self._healthy(candidate, last_used):
+                server = candidate
+            else:
+                self._close(candidate)
+        try:
+            yield server
+        except smtplib.SMTPServerDisconnected:
+            # 连接已断开，不再归还
+            self._close(server)
+            raise
+        except Exception:
+            self._release(server)
+            raise
+        else:
+            self._release(server)
+
+    def _release(self, server: smtplib.SMTP) -> None:
+        try:
+            self._idle.put_nowait((server, time.monotonic()))
+        except Exception:
+            self._close(server)
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except Empty:
+                return
+            self._close(server)
+
+
+smtp_pool = SMTPConnectionPool(
+    maxsize=settings.SMTP_POOL_SIZE, idle_seconds=settings.SMTP_POOL_IDLE_SECONDS
+)
+
+
+@worker_process_shutdown.connect
+def close_smtp_pool(**kwargs) -> None:
+    smtp_pool.close_all()
+
+
+def build_message(email_to: str, subject: str, html: str) -> MIMEMultipart:
+    """
+    构造 HTML 邮件
+    """
+    msg = MIMEMultipart()
+    msg["Subject"] = subject
+    msg["From"] = formataddr((settings.EMAILS_FROM_NAME or "", settings.EMAILS_FROM_EMAIL))
+    msg["To"] = email_to
+    msg.attach(MIMEText(html, "html"))
+    return msg
+
+
+@celery_app.task(
+    name="app.tasks.email.send_email",
+    autoretry_for=(smtplib.SMTPException, OSError),
+    retry_backoff=True,
+    max_retries=3,
+)
+def send_email(email_to: str, subject: str, html: str) -> None:
+    """
+    发送单封邮件
+
+    每封邮件一个任务，重试只会重发这一封；连接池让连续的任务复用同一个连接
+    """
+    with smtp_pool.connection() as server:
+        server.send_message(build_message(email_to, subject, html))
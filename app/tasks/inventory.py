@@ -0,0 +1,28 @@
+import logging
+
+from app.db.session import AsyncSessionLocal
+from app.services.order import order_service
+from app.tasks.celery_app import celery_app, run_async
+
+logger = logging.getLogger(__name__)
+
+async def _release_expired_reservations() -> int:
+    async with AsyncSessionLocal() as db:
+        return await order_service.release_expired_reservations(db)
+
+@celery_app.task(name="app.tasks.inventory.release_expired_reservations")
+def release_expired_reservations() -> int:
+    """取消超时未支付的订单，释放热点 SKU 的预占库存"""
+    released = run_async(_release_expired_reservations())
+    if released:
+        logger.info(f"Released {released} expired inventory reservations")
+    return released
+
+async def _sync_reserved_stock() -> int:
+    async with AsyncSessionLocal() as db:
+        return await order_service.sync_reserved_stock(db)
+
+@celery_app.task(name="app.tasks.inventory.sync_reserved_stock")
+def sync_reserved_stock() -> int:
+    """将热点 SKU 已确认的销量批量同步到数据库库存"""
+    return run_async(_sync_reserved_stock())
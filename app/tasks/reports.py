@@ -0,0 +1,14 @@
+from datetime import datetime
+from app.core.config import settings
+from app.services.reports import report_service
+from app.tasks.celery_app import celery_app, run_async
+
+@celery_app.task(
+    name="app.tasks.reports.generate_cohort_report",
+    soft_time_limit=settings.REPORT_TASK_TIMEOUT_SECONDS,
+)
+def generate_cohort_report(start: str, end: str) -> None:
+    """生成同期群留存报表并缓存"""
+    run_async(report_service.generate_cohort_report(
+        datetime.fromisoformat(start), datetime.fromisoformat(end)
+    ))
@@ -1,130 +1,78 @@
+import logging
 from datetime import datetime, timedelta
-from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
-from app.models.order import Order, OrderItem
-from app.models.user import User
-from app.models.product import Product
-from app.models.after_sale import AfterSale
-from app.models.statistics import SalesTrend, ProductRanking
-from app.schemas.statistics import SalesTrendCreate, ProductRankingCreate
+from typing import List
 
+from celery import chord
+
+from app.core.counters import daily_counters
+from app.db.session import AsyncSessionLocal
+from app.services.statistics import statistics_service
+from app.tasks.celery_app import celery_app, run_async
+
+logger = logging.getLogger(__name__)
+
+@celery_app.task(name="app.tasks.statistics.generate_daily_statistics")
 def generate_daily_statistics():
     """生成每日统计数据"""
-    db = SessionLocal()
-    try:
-        # 获取昨天的日期
-        yesterday = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
-        
-        # 生成销售趋势数据
-        generate_sales_trend(db, yesterday)
-        
-        # 生成商品排行数据
-        generate_product_rankings(db, yesterday)
-        
-        db.commit()
-    except Exception as e:
-        db.rollback()
-        raise e
-    finally:
-        db.close()
+    # 获取昨天的日期
+    yesterday = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+    run_async(statistics_service.rebuild_day(yesterday))
 
-def generate_sales_trend(db: Session, date: datetime):
-    """生成销售趋势数据"""
-    # 检查是否已存在当天的数据
-    existing = db.query(SalesTrend).filter(SalesTrend.date == date).first()
-    if existing:
-        return
-    
-    # 计算销售额
-    total_sales = db.query(func.sum(Order.total_amount)).filter(
-        and_(
-            Order.status.in_(['paid', 'shipped', 'completed']),
-            Order.created_at >= date,
-            Order.created_at < date + timedelta(days=1)
-        )
-    ).scalar() or 0
-    
-    # 计算订单数
-    order_count = db.query(func.count(Order.id)).filter(
-        and_(
-            Order.created_at >= date,
-            Order.created_at < date + timedelta(days=1)
-        )
-    ).scalar() or 0
-    
-    # 计算新增用户数
-    user_count = db.query(func.count(User.id)).filter(
-        and_(
-            User.created_at >= date,
-            User.created_at < date + timedelta(days=1)
-        )
-    ).scalar() or 0
-    
-    # 计算退款金额和数量
-    refund_amount = db.query(func.sum(AfterSale.refund_amount)).filter(
-        and_(
-            AfterSale.status == 'completed',
-            AfterSale.complete_time >= date,
-            AfterSale.complete_time < date + timedelta(days=1)
-        )
-    ).scalar() or 0
-    refund_count = db.query(func.count(AfterSale.id)).filter(
-        and_(
-            AfterSale.status == 'completed',
-            AfterSale.complete_time >= date,
-            AfterSale.complete_time < date + timedelta(days=1)
-        )
-    ).scalar() or 0
-    
-    # 创建销售趋势数据
-    trend_in = SalesTrendCreate(
-        date=date,
-        total_sales=total_sales,
-        order_count=order_count,
-        user_count=user_count,
-        refund_amount=refund_amount,
-        refund_count=refund_count,
-    )
-    db_trend = SalesTrend(**trend_in.dict())
-    db.add(db_trend)
+def last_ended_day() -> datetime:
+    """返回最近一个已结束的日期（UTC 昨天零点）"""
+    return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+
+def day_range(start: datetime, end: datetime) -> List[datetime]:
+    """返回 [start, end] 内的每一天（零点）"""
+    start = start.replace(hour=0, minute=0, second=0, microsecond=0)
+    end = end.replace(hour=0, minute=0, second=0, microsecond=0)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+@celery_app.task(
+    name="app.tasks.statistics.rebuild_statistics_day",
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    max_retries=3,
+)
+def rebuild_statistics_day(day: str) -> str:
+    """重新生成某一天的统计数据（不含周、月汇总），day 为 ISO 格式日期"""
+    run_async(statistics_service.rebuild_day(datetime.fromisoformat(day), periods=False))
+    return day
 
-def generate_product_rankings(db: Session, date: datetime):
-    """生成商品排行数据"""
-    # 检查是否已存在当天的数据
-    existing = db.query(ProductRanking).filter(ProductRanking.date == date).first()
-    if existing:
+@celery_app.task(name="app.tasks.statistics.backfill_finished")
+def backfill_finished(days: List[str]) -> int:
+    """回填完成回调：统一重新计算周、月汇总"""
+    run_async(statistics_service.rebuild_period_rollups(
+        datetime.fromisoformat(min(days)), datetime.fromisoformat(max(days))
+    ))
+    logger.info(f"Statistics backfill finished: {len(days)} days")
+    return len(days)
+
+@celery_app.task(name="app.tasks.statistics.backfill_statistics")
+def backfill_statistics(start: str, end: str) -> None:
+    """按天拆分日期范围，分发到多个 worker 并行回填，结束日期截止到已结束的最后一天"""
+    days = day_range(datetime.fromisoformat(start), min(datetime.fromisoformat(end), last_ended_day()))
+    if not days:
+        logger.warning(f"Statistics backfill skipped: no ended day in {start} ~ {end}")
         return
-    
-    # 获取所有商品
-    products = db.query(Product).all()
-    
-    for product in products:
-        # 计算销售额
-        sales_amount = db.query(func.sum(OrderItem.total_amount)).filter(
-            and_(
-                OrderItem.product_id == product.id,
-                OrderItem.created_at >= date,
-                OrderItem.created_at < date + timedelta(days=1)
-            )
-        ).scalar() or 0
-        
-        # 计算销售数量
-        sales_count = db.query(func.sum(OrderItem.quantity)).filter(
-            and_(
-                OrderItem.product_id == product.id,
-                OrderItem.created_at >= date,
-                OrderItem.created_at < date + timedelta(days=1)
-            )
-        ).scalar() or 0
-        
-        # 创建商品排行数据
-        ranking_in = ProductRankingCreate(
-            date=date,
-            product_id=product.id,
-            product_name=product.name,
-            sales_amount=sales_amount,
-            sales_count=sales_count,
-            view_count=0,  # 需要另外统计
-        )
-        db_ranking = ProductRanking(**ranking_in.dict())
-        db.add(db_ranking) 
\ No newline at end of file
+    chord(
+        rebuild_statistics_day.s(day.date().isoformat()) for day in days
+    )(backfill_finished.s())
+
+@celery_app.task(name="app.tasks.statistics.refresh_sales_rollups")
+def refresh_sales_rollups():
+    """刷新今天的销售汇总，使小时级数据保持最新"""
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    run_async(statistics_service.rebuild_rollups(today))
+
+@celery_app.task(name="app.tasks.statistics.reconcile_daily_counters")
+def reconcile_daily_counters():
+    """用数据库统计结果校正当日实时计数器"""
+    run_async(_reconcile_daily_counters())
+
+async def _reconcile_daily_counters():
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    async with AsyncSessionLocal() as db:
+        totals = await statistics_service.daily_totals(db, today)
+    await daily_counters.overwrite(today, totals)
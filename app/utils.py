@@ -1,30 +1,15 @@
 from datetime import datetime, timedelta
 from typing import Any, Union
-import os
 
 from jose import jwt
 from passlib.context import CryptContext
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
 from pydantic import EmailStr
 
 from app.core.config import settings
+from app.tasks.email import send_email
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-# 邮件配置
-email_conf = ConnectionConfig(
-    MAIL_USERNAME=settings.SMTP_USER,
-    MAIL_PASSWORD=settings.SMTP_PASSWORD,
-    MAIL_FROM=settings.EMAILS_FROM_EMAIL,
-    MAIL_PORT=settings.SMTP_PORT,
-    MAIL_SERVER=settings.SMTP_HOST,
-    MAIL_FROM_NAME=settings.EMAILS_FROM_NAME,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
-    TEMPLATE_FOLDER=os.path.join(os.path.dirname(os.path.dirname(__file__)), "email-templates"),
-)
-
 
 def create_access_token(
     subject: Union[str, Any], expires_delta: timedelta = None
@@ -88,18 +73,14 @@ def verify_password_reset_token(token: str) -> str:
         return None
 
 
-async def send_reset_password_email(email_to: EmailStr, email: str, token: str) -> None:
+def send_reset_password_email(email_to: EmailStr, email: str, token: str) -> None:
     """
-    发送密码重置邮件
+    发送密码重置邮件（投递到邮件队列，由 Celery worker 发送）
     """
     project_name = settings.PROJECT_NAME
     subject = f"{project_name} - 密码重置"
     reset_link = f"{settings.SERVER_HOST}/reset-password?token={token}"
-    
-    message = MessageSchema(
-        subject=subject,
-        recipients=[email_to],
-        body=f"""
+    html = f"""
         <html>
             <body>
                 <p>您好，</p>
@@ -112,9 +93,5 @@ async def send_reset_password_email(email_to: EmailStr, email: str, token: str)
                 <p>{project_name} 团队</p>
             </body>
         </html>
-        """,
-        subtype="html",
-    )
-    
-    fm = FastMail(email_conf)
-    await fm.send_message(message) 
\ No newline at end of file
+        """
+    send_email.delay(email_to=email_to, subject=subject, html=html)
@@ -17,6 +17,7 @@ setup(
         "pymysql",
         "aioredis",
         "celery",
+        "numpy",
         "python-dotenv",
     ],
 ) 
\ No newline at end of file
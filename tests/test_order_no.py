@@ -0,0 +1,104 @@
+import itertools
+import multiprocessing
+import time
+from unittest import mock
+
+import pytest
+
+from app.core import order_no
+from app.core.order_no import SEQUENCE_LIMIT, OrderNoGenerator
+
+# 2024-01-01 00:00:00.500 UTC
+BASE_TIME = 1704067200.5
+PROCESSES = 4
+IDS_PER_PROCESS = 5000
+
+
+def _generator(worker_id: int) -> OrderNoGenerator:
+    """
+    不连接 Redis，直接持有指定 worker id 的租约
+    """
+    generator = OrderNoGenerator()
+    generator.worker_id = worker_id
+    generator._lease_deadline = time.monotonic() + 3600
+    return generator
+
+
+def _frozen_clock():
+    return lambda: BASE_TIME
+
+
+def _rewinding_clock():
+    """
+    每 300 次调用时钟回拨 2 秒
+    """
+    counter = itertools.count()
+    return lambda: BASE_TIME + 1 - 2 * ((next(counter) // 300) % 2)
+
+
+CLOCKS = {
+    "real": None,
+    "frozen": _frozen_clock,
+    "rewind": _rewinding_clock,
+}
+
+
+def _generate(worker_id: int, clock: str, count: int):
+    generator = _generator(worker_id)
+    if CLOCKS[clock] is None:
+        return [generator.generate() for _ in range(count)]
+    with mock.patch.object(order_no.time, "time", CLOCKS[clock]()):
+        return [generator.generate() for _ in range(count)]
+
+
+def _assert_increasing(ids):
+    assert all(len(i) == 24 and i.isdigit() for i in ids)
+    assert all(a < b for a, b in zip(ids, ids[1:]))
+
+
+@pytest.mark.parametrize("clock", list(CLOCKS))
+def test_unique_across_processes(clock):
+    worker_ids = [3, 17, 256, 1023]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(PROCESSES) as pool:
+        results = pool.starmap(
+            _generate, [(worker_id, clock, IDS_PER_PROCESS) for worker_id in worker_ids]
+        )
+
+    all_ids = [i for ids in results for i in ids]
+    assert len(set(all_ids)) == PROCESSES * IDS_PER_PROCESS
+    for worker_id, ids in zip(worker_ids, results):
+        _assert_increasing(ids)
+        assert {i[17:21] for i in ids} == {f"{worker_id:04d}"}
+
+
+def test_sequence_overflow_advances_millisecond(monkeypatch):
+    monkeypatch.setattr(order_no.time, "time", _frozen_clock())
+    generator = _generator(1)
+    ids = [generator.generate() for _ in range(SEQUENCE_LIMIT * 2 + 1)]
+
+    _assert_increasing(ids)
+    base_ms = int(BASE_TIME * 1000)
+    assert [int(i[14:17]) for i in (ids[0], ids[SEQUENCE_LIMIT], ids[-1])] == [
+        base_ms % 1000, (base_ms + 1) % 1000, (base_ms + 2) % 1000,
+    ]
+    assert ids[SEQUENCE_LIMIT - 1].endswith(f"{SEQUENCE_LIMIT - 1:03d}")
+    assert ids[SEQUENCE_LIMIT].endswith("000")
+
+
+def test_clock_rewind_keeps_increasing(monkeypatch):
+    clock = iter([BASE_TIME + 5, BASE_TIME + 5, BASE_TIME, BASE_TIME + 1, BASE_TIME + 6])
+    monkeypatch.setattr(order_no.time, "time", lambda: next(clock))
+    generator = _generator(1)
+    ids = [generator.generate() for _ in range(5)]
+
+    _assert_increasing(ids)
+    # 回拨期间沿用上一次的毫秒，时钟追上后恢复使用当前时间
+    assert [i[-3:] for i in ids] == ["000", "001", "002", "003", "000"]
+
+
+def test_expired_lease_refuses_to_generate():
+    generator = _generator(1)
+    generator._lease_deadline = time.monotonic() - 1
+    with pytest.raises(RuntimeError):
+        generator.generate()